@@ -1,36 +1,276 @@
-import PyInstaller.__main__
-import platform
+import argparse
+import ast
+import glob
+import json
 import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_NAME = "PUBG_Map_Overlay"
+
+# Always excluded: never imported by main.py
+BASE_EXCLUDES = ["numpy", "cv2"]
+
+# Considered by --profile aggressive. Each one is excluded only if the import
+# trace shows neither it nor any of its submodules being loaded.
+EXCLUDE_CANDIDATES = [
+    "asyncio.windows_utils", "concurrent.futures.process", "ctypes.test", "distutils",
+    "doctest", "email", "ftplib", "http", "imaplib", "lib2to3", "mailbox", "multiprocessing",
+    "pdb", "pkg_resources", "pydoc", "pydoc_data", "setuptools", "smtplib", "sqlite3",
+    "test", "tkinter.test", "tkinter.tix", "unittest", "urllib.request", "xml", "xmlrpc",
+    "PIL.ImageCms", "PIL.ImageMath", "PIL.ImageQt", "PIL.ImageShow", "PIL.ImageTk",
+    "PIL._avif", "PIL._webp",
+]
+
+# Opened or written outside the traced launch: PNG assets, and the ICO that
+# pystray's Windows backend writes for the tray icon
+ALWAYS_KEEP = ["PIL.PngImagePlugin", "PIL.IcoImagePlugin", "PIL.BmpImagePlugin"]
+
+
+def pillow_plugins():
+    """Image format plugins shipped with the installed Pillow"""
+    try:
+        import PIL
+    except ImportError:
+        return []
+    paths = glob.glob(os.path.join(os.path.dirname(PIL.__file__), "*ImagePlugin.py"))
+    return sorted(f"PIL.{os.path.splitext(os.path.basename(path))[0]}" for path in paths)
+
+
+def isolated_env(config_home):
+    """Environment whose config dir (and instance lock) is a scratch directory"""
+    env = dict(os.environ, HOME=config_home, LOCALAPPDATA=config_home, APPDATA=config_home)
+    # Startup timings are the app's own, not the user's site customisations
+    env.pop("PYTHONSTARTUP", None)
+    return env
+
+
+def parse_importtime(stderr):
+    """Module names from python -X importtime output"""
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        name = line.rsplit("|", 1)[1].strip()
+        if name and name != "imported package":
+            modules.add(name)
+    return modules
+
+
+def lazy_imports(path):
+    """Modules main.py imports inside functions (tray, capture, raster, CLI)"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = set()
+    for func in ast.walk(tree):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for node in ast.walk(func):
+            if isinstance(node, ast.Import):
+                modules.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules.add(node.module)
+                modules.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return modules
+
+
+def trace_imports():
+    """Modules loaded by a real launch of main.py plus everything its lazy imports pull in"""
+    config_home = tempfile.mkdtemp(prefix="overlay_trace_")
+    try:
+        run = subprocess.run(
+            [sys.executable, "-X", "importtime", "main.py", "--exit-after-startup"],
+            env=isolated_env(config_home), capture_output=True, text=True, timeout=120
+        )
+        if run.returncode != 0:
+            sys.exit(f"Traced launch failed (exit {run.returncode}):\n{run.stderr[-2000:]}")
+        traced = parse_importtime(run.stderr)
+
+        # The launch exits before the settings window, marking modes or tray are used.
+        # Features not present on this platform (e.g. msvcrt on Linux) fail to import and are skipped.
+        for module in sorted(lazy_imports("main.py")):
+            probe = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                env=isolated_env(config_home), capture_output=True, text=True, timeout=60
+            )
+            if probe.returncode == 0:
+                traced |= parse_importtime(probe.stderr)
+    finally:
+        shutil.rmtree(config_home, ignore_errors=True)
+    return traced
+
+
+def derive_excludes(traced):
+    """Candidates that the trace never loaded, themselves or through a submodule"""
+    excludes = []
+    for candidate in EXCLUDE_CANDIDATES + pillow_plugins():
+        if candidate in ALWAYS_KEEP or candidate in traced:
+            continue
+        if any(name.startswith(candidate + ".") for name in traced):
+            continue
+        excludes.append(candidate)
+    return excludes
+
+
+def artifact_path(onedir):
+    exe = APP_NAME + (".exe" if platform.system() == "Windows" else "")
+    return os.path.join("dist", APP_NAME, exe) if onedir else os.path.join("dist", exe)
+
 
-def build():
+def build(onedir=False, excludes=()):
     # Determine the separator for --add-data based on the OS
     if platform.system() == "Windows":
         separator = ";"
     else:
         separator = ":"
 
-    print(f"Building for {platform.system()}...")
-
-    print(f"Building for {platform.system()}...")
+    print(f"Building for {platform.system()} ({'onedir' if onedir else 'onefile'})...")
     print(f"Resource separator: '{separator}'")
 
+    # Pre-rendered overlay variants (tools/generate_overlay.py --batch) are optional
+    extra_data = []
+    variants_dir = os.path.join("assets", "variants")
+    if os.path.isdir(variants_dir):
+        extra_data.append(f'--add-data={variants_dir}{separator}{variants_dir}')
+
+    import PyInstaller.__main__
     PyInstaller.__main__.run([
         'main.py',
-        '--name=PUBG_Map_Overlay',
-        '--onefile',
+        f'--name={APP_NAME}',
+        # onedir skips the per-launch extraction to a temp dir that onefile does
+        '--onedir' if onedir else '--onefile',
         '--noconsole',
         f'--add-data={os.path.join("assets", "overlay_circle.png")}{separator}assets',
+        f'--add-data={os.path.join("assets", "overlay_circle.ovl")}{separator}assets',
+        f'--add-data={os.path.join("assets", "maps.json")}{separator}assets',
         f'--add-data={os.path.join("assets", "icon.ico")}{separator}assets',
+        *extra_data,
         '--clean',
+        '--noconfirm',
         '--icon=' + os.path.join('assets', 'icon.ico'),
-        '--exclude-module=numpy',
-        '--exclude-module=cv2',
+        *(f'--exclude-module={module}' for module in [*BASE_EXCLUDES, *excludes]),
         # '--windowed' is implied by --noconsole but good to be explicit for Mac
-        '--windowed', 
+        '--windowed',
     ])
 
     print("\nBuild complete!")
-    print(f"Check the 'dist' folder for the executable.")
+    print(f"Executable: {artifact_path(onedir)}")
+
+
+def time_launch(path, config_home):
+    start = time.perf_counter()
+    run = subprocess.run([os.path.abspath(path), "--exit-after-startup"],
+                         env=isolated_env(config_home), cwd=os.path.dirname(os.path.abspath(path)),
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=120)
+    elapsed = time.perf_counter() - start
+    if run.returncode != 0:
+        sys.exit(f"{path} exited with {run.returncode} during timing")
+    return elapsed
+
+
+def drop_page_cache():
+    """Linux only, needs root; elsewhere cold runs only start from a fresh config dir"""
+    try:
+        subprocess.run(["sync"], check=False)
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def summarize(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {"min": round(ms[0], 1), "median": round(statistics.median(ms), 1),
+            "max": round(ms[-1], 1), "n": len(ms)}
+
+
+def bench_startup(path, runs):
+    """Launch-to-exit time of the built artifact, cold (first launch) and warm (repeat launches)"""
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found; build it first")
+
+    cold, warm = [], []
+    page_cache = False
+    for _ in range(runs):
+        # First launch: no config.ini, no image cache, page cache dropped where possible
+        config_home = tempfile.mkdtemp(prefix="overlay_cold_")
+        try:
+            page_cache = drop_page_cache()
+            cold.append(time_launch(path, config_home))
+        finally:
+            shutil.rmtree(config_home, ignore_errors=True)
+
+    config_home = tempfile.mkdtemp(prefix="overlay_warm_")
+    try:
+        # Prime the config dir and OS caches, then measure repeat launches
+        time_launch(path, config_home)
+        for _ in range(runs):
+            warm.append(time_launch(path, config_home))
+    finally:
+        shutil.rmtree(config_home, ignore_errors=True)
+
+    return {"artifact": path, "bytes": artifact_size(path), "page_cache_dropped": page_cache,
+            "cold_ms": summarize(cold), "warm_ms": summarize(warm)}
+
+
+def artifact_size(path):
+    root = os.path.dirname(path)
+    if os.path.basename(root) != APP_NAME:
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the overlay with PyInstaller")
+    parser.add_argument("--onedir", action="store_true",
+                        help="build a folder with a launcher exe instead of a single self-extracting exe")
+    parser.add_argument("--profile", choices=["default", "aggressive"], default="default",
+                        help="aggressive also excludes modules a traced launch never imports")
+    parser.add_argument("--trace-only", action="store_true",
+                        help="print the aggressive exclusion list and exit")
+    parser.add_argument("--bench", type=int, metavar="RUNS", default=0,
+                        help="time RUNS cold and warm launches of the artifact afterwards")
+    parser.add_argument("--no-build", action="store_true", help="only time an existing artifact")
+    parser.add_argument("--output", help="write the timing results as JSON to this file")
+    args = parser.parse_args()
+
+    # Assets and main.py are resolved relative to the project root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    excludes = []
+    if args.profile == "aggressive" or args.trace_only:
+        traced = trace_imports()
+        excludes = derive_excludes(traced)
+        print(f"Import trace: {len(traced)} modules loaded, {len(excludes)} excluded")
+        print("  " + "\n  ".join(excludes))
+        if args.trace_only:
+            return
+
+    if not args.no_build:
+        build(args.onedir, excludes)
+
+    if args.bench:
+        results = dict(bench_startup(artifact_path(args.onedir), args.bench),
+                       layout="onedir" if args.onedir else "onefile", profile=args.profile)
+        print(f"\n{'launch':<8}{'min':>10}{'median':>10}{'max':>10}  (ms, {args.bench} runs)")
+        for name in ("cold", "warm"):
+            stats = results[f"{name}_ms"]
+            print(f"{name:<8}{stats['min']:>10.1f}{stats['median']:>10.1f}{stats['max']:>10.1f}")
+        print(f"size: {results['bytes'] / (1024 * 1024):.1f}MB")
+        if not results["page_cache_dropped"]:
+            print("(page cache not dropped: cold runs only start from a fresh config dir)")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=4)
+                f.write("\n")
+            print(f"Results written to {args.output}")
+
 
 if __name__ == "__main__":
-    build()
+    main()
@@ -1,30 +1,1343 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-from pynput import keyboard
+import time
+_imports_started = time.perf_counter()
+
 import platform
 import configparser
 import os
 import sys
 import threading
-import pystray
-import ctypes
-if platform.system() == "Windows":
-    from ctypes import windll, wintypes
+import contextlib
+import functools
+import heapq
+import hashlib
+import io
+import json
+import struct
+import tempfile
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from dataclasses import dataclass, fields, replace
+# PIL, pynput, pystray and ctypes are imported where they are used, so the
+# vector overlay can be shown before any of them is loaded
+
+# Bound by load_tk(), so a second launch can hand off (and the distance CLI
+# run) without loading Tcl/Tk at all
+tk = ttk = messagebox = None
 
 CONFIG_VERSION = "1.2"
 
+def load_tk():
+    global tk, ttk, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as tkinter_ttk, messagebox as tkinter_messagebox
+        tk, ttk, messagebox = tkinter, tkinter_ttk, tkinter_messagebox
+    return tk
+
+def apply_transparency(window):
+    """Make a window's background see-through, return the background color to use.
+
+    Windows keys out black and macOS has a transparent background color. X11 Tk
+    has neither, so there the background simply stays black.
+    """
+    system = platform.system()
+    if system == "Darwin":
+        window.wm_attributes("-transparent", True)
+        return "systemTransparent"
+    if system == "Windows":
+        window.wm_attributes("-transparentcolor", "black")
+    return "black"
+
+_imports_elapsed = time.perf_counter() - _imports_started
+
+@dataclass
+class MapCalibration:
+    """Typed per-map calibration, parsed once so hot paths read plain attributes"""
+    scale_factor: float = 1.0
+    offset_x: int = 0
+    offset_y: int = 0
+    pixels_per_km: float = 0.0
+
+    @classmethod
+    def from_config(cls, config, section, defaults):
+        """Read a [Map.<id>] section, falling back to the map's manifest defaults"""
+        values = {}
+        for field in fields(cls):
+            raw = config.get(section, field.name, fallback=None)
+            if raw is None:
+                raw = defaults.get(field.name, field.default)
+            try:
+                values[field.name] = int(float(raw)) if field.type is int else float(raw)
+            except (TypeError, ValueError):
+                print(f"Invalid {field.name} in [{section}]: {raw!r}, using default.")
+                values[field.name] = defaults.get(field.name, field.default)
+        calibration = cls(**values)
+        calibration.validate()
+        return calibration
+
+    def validate(self):
+        # NaN fails every comparison, so these also catch it
+        if not self.scale_factor > 0:
+            self.scale_factor = 1.0
+        if not self.pixels_per_km >= 0:
+            self.pixels_per_km = 0.0
+
+    def write_to(self, config, section, names=None):
+        if not config.has_section(section):
+            config.add_section(section)
+        for name in names or [field.name for field in fields(self)]:
+            config.set(section, name, str(getattr(self, name)))
+
+class ConfigWriter:
+    """Debounced write-behind for config.ini.
+
+    Writes go to a temp file that is fsynced and renamed over config.ini, so a
+    crash mid-write leaves the previous file intact rather than a truncated one.
+    """
+
+    def __init__(self, path, delay=1.0):
+        self.path = path
+        self.delay = delay
+        self.condition = threading.Condition()
+        # Serializes writes from the debounce thread and flush(); generations
+        # keep a late, older snapshot from replacing a newer one on disk
+        self.write_lock = threading.Lock()
+        self.generation = 0
+        self.written = 0
+        self.pending = None
+        self.deadline = 0.0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def serialize(config):
+        buffer = io.StringIO()
+        config.write(buffer)
+        return buffer.getvalue()
+
+    @staticmethod
+    def write_atomic(path, text):
+        directory, name = os.path.split(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+    def schedule(self, config):
+        """Snapshot config now (caller's thread) and write it after the debounce delay"""
+        text = self.serialize(config)
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, text)
+            self.deadline = time.monotonic() + self.delay
+            self.condition.notify()
+
+    def flush(self):
+        """Write any pending snapshot immediately"""
+        with self.condition:
+            pending, self.pending = self.pending, None
+        if pending is not None:
+            self.write(*pending)
+
+    def stop(self):
+        self.flush()
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        # A write the thread already started finishes before the process exits
+        self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and (self.pending is None or time.monotonic() < self.deadline):
+                    timeout = None if self.pending is None else self.deadline - time.monotonic()
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
+                pending, self.pending = self.pending, None
+            self.write(*pending)
+
+    def write(self, generation, text):
+        with self.write_lock:
+            if generation <= self.written:
+                return
+            try:
+                self.write_atomic(self.path, text)
+                self.written = generation
+            except OSError as e:
+                print(f"Failed to save config: {e}")
+
+def offset_distance_m(dx, dy, pixels_per_km):
+    """Meters for a screen offset; the one formula behind every distance shown or exported"""
+    pixel_distance = (dx**2 + dy**2)**0.5
+    distance_km = pixel_distance / pixels_per_km
+    return distance_km * 1000
+
+def distance_m(point1, point2, pixels_per_km):
+    """Real-world distance in meters between two screen points"""
+    x1, y1 = point1
+    x2, y2 = point2
+    return offset_distance_m(x2 - x1, y2 - y1, pixels_per_km)
+
+def distance_row(points, index, pixels_per_km):
+    """Distances in meters from points[index] to every point (0 for itself)"""
+    x1, y1 = points[index]
+    return array("d", (offset_distance_m(x - x1, y - y1, pixels_per_km) for x, y in points))
+
+def distance_matrix(points, pixels_per_km):
+    """All pairwise distances in meters, one array row per point.
+
+    Only the upper triangle is computed and mirrored; every entry equals the
+    distance_m result for that pair.
+    """
+    n = len(points)
+    matrix = [array("d", bytes(8 * n)) for _ in range(n)]
+    for i in range(n):
+        x1, y1 = points[i]
+        row = matrix[i]
+        for j in range(i + 1, n):
+            x2, y2 = points[j]
+            d = offset_distance_m(x2 - x1, y2 - y1, pixels_per_km)
+            row[j] = d
+            matrix[j][i] = d
+    return matrix
+
+# Render height -> on-screen height of the full map image, in physical pixels.
+# The in-game map fills the screen height; [ScaleTable] in config.ini overrides entries.
+DEFAULT_SCALE_TABLE = {720: 720, 900: 900, 1080: 1080, 1200: 1200, 1440: 1440, 1600: 1600, 2160: 2160}
+
+def load_scale_table(config):
+    """DEFAULT_SCALE_TABLE with the [ScaleTable] overrides from config.ini"""
+    table = dict(DEFAULT_SCALE_TABLE)
+    if config.has_section("ScaleTable"):
+        for height, target in config.items("ScaleTable"):
+            try:
+                table[int(height)] = float(target)
+            except ValueError:
+                print(f"Invalid [ScaleTable] entry {height} = {target!r}, ignored.")
+    return table
+
+def target_height_for(mode, render_height, scale_table, dpi_scale=1.0):
+    """On-screen height of the full overlay image (logical pixels) for a resolution mode"""
+    if mode == "QHD":
+        return 1440
+    if mode == "FHD":
+        return 1080
+    return lookup_scale_table(scale_table, render_height) / dpi_scale
+
+def lookup_scale_table(table, render_height):
+    """Target height for a render height: exact entry, else scaled from the nearest entry"""
+    if render_height in table:
+        return table[render_height]
+    nearest = min(table, key=lambda height: abs(height - render_height))
+    return table[nearest] * render_height / nearest
+
+class MapTransform:
+    """Affine screen pixel -> map km transform for one calibration/placement.
+
+    The origin is the overlay image's top-left corner on screen (center of the
+    screen + offset, scaled like update_image); the scale comes from the 1km
+    calibration. Everything is precomputed so lookups are a multiply-add.
+    """
+
+    def __init__(self, origin_x, origin_y, pixels_per_km, size_km, grid_km=1.0):
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.km_per_pixel = 1.0 / pixels_per_km if pixels_per_km > 0 else 0.0
+        self.size_km = size_km
+        self.grid_km = grid_km
+        self.columns = max(1, int(round(size_km / grid_km)))
+
+    @classmethod
+    def from_overlay(cls, calibration, manifest, screen_width, screen_height, target_height):
+        """Build the transform for an overlay placed the way OverlayApp.update_image places it"""
+        width = manifest.get("width", 2475)
+        height = manifest.get("height", 2475)
+        final_scale = target_height / height * calibration.scale_factor
+        origin_x = screen_width // 2 + calibration.offset_x - width / 2 * final_scale
+        origin_y = screen_height // 2 + calibration.offset_y - height / 2 * final_scale
+        return cls(origin_x, origin_y, calibration.pixels_per_km,
+                   manifest.get("size_km", 4.0), manifest.get("grid_km", 1.0))
+
+    def to_km(self, x, y):
+        return (x - self.origin_x) * self.km_per_pixel, (y - self.origin_y) * self.km_per_pixel
+
+    def grid_cell(self, x, y):
+        """Grid square name like "D5" for a screen point, None when off the map"""
+        km_x, km_y = self.to_km(x, y)
+        if self.km_per_pixel == 0 or not (0 <= km_x < self.size_km and 0 <= km_y < self.size_km):
+            return None
+        column = int(km_x / self.grid_km)
+        row = int(km_y / self.grid_km)
+        return f"{chr(ord('A') + column)}{row + 1}"
+
+def default_config_dir():
+    """Per-user directory holding config.ini and caches"""
+    app_name = "PUBG_Map_Overlay"
+    system = platform.system()
+
+    if system == "Windows":
+        base_dir = os.getenv("LOCALAPPDATA")
+        if not base_dir: # Fallback
+            base_dir = os.path.expanduser("~\\AppData\\Local")
+    elif system == "Darwin":
+        base_dir = os.path.expanduser("~/Library/Application Support")
+    else: # Linux/Other
+        base_dir = os.path.expanduser("~/.config")
+
+    return os.path.join(base_dir, app_name)
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def migrate_map_settings(config, default_id):
+    """Move pre-registry calibration ([Settings]/[Calibration]) to the default map's section"""
+    section = f"Map.{default_id}"
+    if config.has_section(section):
+        return
+    config.add_section(section)
+    for old_section, key in [("Settings", "scale_factor"), ("Settings", "offset_x"),
+                             ("Settings", "offset_y"), ("Calibration", "pixels_per_km")]:
+        if config.has_option(old_section, key):
+            config.set(section, key, config.get(old_section, key))
+
+class InstanceLock:
+    """Per-user lock so only one overlay (and one global keyboard hook) runs at a time.
+
+    The running instance publishes its control socket address next to the
+    lock, so a second launch can hand its request over and exit.
+    """
+
+    def __init__(self, config_dir):
+        self.path = os.path.join(config_dir, "instance.lock")
+        self.info_path = os.path.join(config_dir, "instance.json")
+        self.file = None
+
+    def acquire(self):
+        """Take the lock without blocking; False if another instance holds it"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            if platform.system() == "Windows":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        # Held until the process exits; the OS drops it even after a crash
+        self.file = f
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.info_path)
+        return True
+
+    def publish(self, address):
+        ConfigWriter.write_atomic(self.info_path, json.dumps({"pid": os.getpid(), "address": address}))
+
+    def unpublish(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.info_path)
+
+    def running_address(self, wait=2.0):
+        """Control address of the instance holding the lock (it may still be starting up)"""
+        deadline = time.perf_counter() + wait
+        while True:
+            try:
+                with open(self.info_path, encoding="utf-8") as f:
+                    return json.load(f)["address"]
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                if time.perf_counter() >= deadline:
+                    return None
+                time.sleep(0.02)
+
+def send_control_command(address, command, timeout=1.0):
+    """Send one line to a ControlServer and return its reply line"""
+    import socket
+
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    else:
+        sock = socket.create_connection(tuple(address), timeout=timeout)
+    with sock:
+        sock.sendall((command + "\n").encode("utf-8"))
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    return reply.decode("utf-8", "replace").strip()
+
+def hand_off_to_running_instance(lock, command="action open_settings"):
+    """Forward a request to the running overlay; returns the process exit code"""
+    started = time.perf_counter()
+    address = lock.running_address()
+    if address is None:
+        print("Another overlay instance is starting or not responding.")
+        return 1
+    try:
+        reply = send_control_command(address, command)
+    except OSError as e:
+        print(f"Could not reach the running overlay ({e}).")
+        return 1
+    print(f"Overlay already running, forwarded {command!r}: {reply} "
+          f"({(time.perf_counter() - started) * 1000:.1f}ms)")
+    return 0 if reply.startswith("OK") else 1
+
+class StartupProfiler:
+    """Wall time per startup phase, reported with --profile-startup"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.phases = []
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self.phases.append((name, seconds))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def mark(self, name):
+        """Record the time elapsed since the profiler was created"""
+        self.record(name, time.perf_counter() - self.started)
+
+    def write_report(self, path):
+        if not self.enabled:
+            return
+        lines = [f"{name:<24}{seconds * 1000:10.1f} ms" for name, seconds in self.phases]
+        report = "Startup profile\n" + "\n".join(lines) + "\n"
+        print(report)
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(report)
+            print(f"Startup profile written to {path}")
+        except OSError as e:
+            print(f"Failed to write startup profile: {e}")
+
+class ScaledImageCache:
+    """Persistent on-disk LRU cache of resized overlay images"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, source_hash, size, resample):
+        # Content-addressed: any change to the source asset produces new keys
+        return f"{source_hash}_{size[0]}x{size[1]}_{resample.name.lower()}"
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def get(self, key):
+        path = self.path_for(key)
+        from PIL import Image
+
+        try:
+            image = Image.open(path)
+            image.load()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            # Truncated or corrupt entry, drop it and resample
+            print(f"Discarding broken cache entry {path}: {e}")
+            self.remove(path)
+            return None
+
+        # Touch the file so eviction treats it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return image
+
+    def put(self, key, image):
+        path = self.path_for(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            image.save(tmp_path, format="PNG", compress_level=1)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Failed to write cache entry {path}: {e}")
+            self.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".png") or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class LatencyStats:
+    """Per-action hotkey latency histograms (pynput callback -> Tk handler -> canvas updated)"""
+
+    # Upper bucket bounds in milliseconds, the last bucket is open ended
+    BUCKETS_MS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.actions = {}
+        self.lock = threading.Lock()
+
+    def now(self):
+        """Timestamp for a measurement, or None when disabled so callers can skip work"""
+        return time.perf_counter() if self.enabled else None
+
+    def record(self, action, t_callback, t_handler, t_done):
+        queue_ms = (t_handler - t_callback) * 1000
+        total_ms = (t_done - t_callback) * 1000
+        with self.lock:
+            stats = self.actions.get(action)
+            if stats is None:
+                stats = self.actions[action] = {
+                    "count": 0, "queue_sum_ms": 0.0, "total_sum_ms": 0.0, "total_max_ms": 0.0,
+                    "histogram": [0] * (len(self.BUCKETS_MS) + 1)
+                }
+            stats["count"] += 1
+            stats["queue_sum_ms"] += queue_ms
+            stats["total_sum_ms"] += total_ms
+            stats["total_max_ms"] = max(stats["total_max_ms"], total_ms)
+            stats["histogram"][self.bucket_index(total_ms)] += 1
+
+    def bucket_index(self, ms):
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if ms <= bound:
+                return i
+        return len(self.BUCKETS_MS)
+
+    def percentile(self, histogram, fraction):
+        """Approximate percentile as the upper bound of the bucket containing it"""
+        target = fraction * sum(histogram)
+        seen = 0
+        for i, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else float("inf")
+        return 0
+
+    def summary_lines(self):
+        with self.lock:
+            snapshot = {name: dict(stats, histogram=list(stats["histogram"])) for name, stats in self.actions.items()}
+        if not snapshot:
+            return ["기록 없음"]
+        lines = []
+        for name, stats in sorted(snapshot.items()):
+            count = stats["count"]
+            lines.append(
+                f"{name}: n={count}  queue {stats['queue_sum_ms'] / count:.1f}ms  "
+                f"total avg {stats['total_sum_ms'] / count:.1f}ms  "
+                f"p90<={self.percentile(stats['histogram'], 0.9)}ms  max {stats['total_max_ms']:.1f}ms"
+            )
+        return lines
+
+    def dump(self, path):
+        with self.lock:
+            data = {"buckets_ms": list(self.BUCKETS_MS), "actions": self.actions}
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+
+    def reset(self):
+        with self.lock:
+            self.actions.clear()
+
+class HotkeyDispatcher:
+    """Bounded queue from the pynput listener thread to a single Tk-side poller.
+
+    The listener only appends; it never calls into Tcl, so a busy Tk thread
+    cannot hold it up. Toggle actions cancel out in pairs and idempotent
+    actions collapse to one run per drain; events older than max_age are
+    dropped instead of replayed.
+    """
+
+    POLL_MS = 10
+
+    TOGGLE_ACTIONS = {"toggle_visibility", "measure_distance", "measure_path", "mark_many"}
+    IDEMPOTENT_ACTIONS = {"open_settings", "calibrate_mode"}
+
+    def __init__(self, root, run_action, max_depth=32, max_age=0.5):
+        self.root = root
+        self.run_action = run_action
+        self.max_age = max_age
+        # deque.append/popleft are atomic, so the listener thread never takes a lock
+        self.queue = deque(maxlen=max_depth)
+        self.running = False
+        self.poll_id = None
+        self.posted = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.dropped_full = 0
+        self.dropped_stale = 0
+        self.max_depth_seen = 0
+
+    def post(self, action):
+        """Queue an action (any thread)"""
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped_full += 1  # Oldest event is pushed out by append
+        self.queue.append((action, time.perf_counter()))
+        self.posted += 1
+        self.max_depth_seen = max(self.max_depth_seen, len(self.queue))
+
+    def start(self):
+        """Start polling the queue (Tk thread)"""
+        if not self.running:
+            self.running = True
+            self.poll_id = self.root.after(self.POLL_MS, self.poll)
+
+    def stop(self):
+        self.running = False
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+
+    def poll(self):
+        self.poll_id = None
+        try:
+            if self.queue:
+                self.drain()
+        finally:
+            # An action may have stopped the dispatcher (quit)
+            if self.running:
+                self.poll_id = self.root.after(self.POLL_MS, self.poll)
+
+    def drain(self):
+        """Run the queued actions after coalescing (Tk thread)"""
+        events = []
+        while True:
+            try:
+                events.append(self.queue.popleft())
+            except IndexError:
+                break
+
+        now = time.perf_counter()
+        runs = []          # [action, posted_at, count] in arrival order
+        coalescable = {}   # action -> its entry in runs
+        for action, posted_at in events:
+            if now - posted_at > self.max_age:
+                self.dropped_stale += 1
+                continue
+            if action in coalescable:
+                # Keep the earliest timestamp so latency stats include the queueing
+                coalescable[action][2] += 1
+                self.coalesced += 1
+                continue
+            entry = [action, posted_at, 1]
+            runs.append(entry)
+            if action in self.TOGGLE_ACTIONS or action in self.IDEMPOTENT_ACTIONS:
+                coalescable[action] = entry
+
+        for action, posted_at, count in runs:
+            if action in self.TOGGLE_ACTIONS and count % 2 == 0:
+                continue  # An even number of toggles leaves the state unchanged
+            self.executed += 1
+            self.run_action(action, posted_at)
+
+    def depth(self):
+        return len(self.queue)
+
+    def summary_lines(self):
+        return [
+            f"queue: depth {self.depth()} (max {self.max_depth_seen})  posted {self.posted}  "
+            f"executed {self.executed}  coalesced {self.coalesced}",
+            f"dropped: full {self.dropped_full}  stale {self.dropped_stale}"
+        ]
+
+class ControlServer:
+    """Optional local command socket for scripts and stream-deck style tools.
+
+    An asyncio server runs in its own thread (localhost TCP, or a Unix socket
+    where supported). Each line is one command. Replies come back in order, one
+    line each: "OK <ms> [result]" or "ERR <ms> <message>". Here <ms> is the round
+    trip from reading the line to the Tk thread finishing it. Clients may
+    pipeline; at most max_pending commands wait for the Tk thread, and
+    further ones are refused with "ERR 0.00 busy".
+    """
+
+    def __init__(self, root, handle_command, max_pending=64):
+        self.root = root
+        self.handle_command = handle_command
+        self.max_pending = max_pending
+        self.queue = deque()
+        self.drain_scheduled = False
+        self.stats = LatencyStats(enabled=True)
+        self.loop = None
+        self.address = None
+
+    def start(self, host="127.0.0.1", port=0, unix_path=None):
+        """Start the server thread; returns the bound address or None"""
+        ready = threading.Event()
+        thread = threading.Thread(target=self.run, args=(host, port, unix_path, ready), daemon=True)
+        thread.start()
+        ready.wait(2.0)
+        return self.address
+
+    def run(self, host, port, unix_path, ready):
+        import asyncio
+
+        self.loop = asyncio.new_event_loop()
+        try:
+            if unix_path and hasattr(asyncio, "start_unix_server"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(unix_path)  # Left over from a crashed run
+                server = self.loop.run_until_complete(asyncio.start_unix_server(self.serve, path=unix_path))
+                self.address = unix_path
+            else:
+                server = self.loop.run_until_complete(asyncio.start_server(self.serve, host, port))
+                self.address = server.sockets[0].getsockname()[:2]
+        except OSError as e:
+            print(f"Control server failed to start: {e}")
+            ready.set()
+            return
+        ready.set()
+        print(f"[DEBUG] Control server listening on {self.address}")
+        try:
+            self.loop.run_forever()
+        finally:
+            server.close()
+            self.loop.run_until_complete(server.wait_closed())
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def serve(self, reader, writer):
+        import asyncio
+
+        # Bounded per connection: a client pipelining faster than Tk drains is paused on read,
+        # so only several clients together can hit the global max_pending limit
+        replies = asyncio.Queue(maxsize=max(1, self.max_pending // 2))
+        sender = asyncio.ensure_future(self.send_replies(replies, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", "replace").strip()
+                if command:
+                    await replies.put(self.submit(command))
+        except ConnectionError:
+            pass
+        finally:
+            await replies.put(None)
+            await sender
+            writer.close()
+
+    async def send_replies(self, replies, writer):
+        connected = True
+        while True:
+            future = await replies.get()
+            if future is None:
+                return
+            reply = await future
+            if not connected:
+                continue  # Keep consuming so the reader is never blocked on a dead client
+            try:
+                writer.write((reply + "\n").encode("utf-8"))
+                await writer.drain()
+            except ConnectionError:
+                connected = False
+
+    def submit(self, command):
+        """Queue a command for the Tk thread (loop thread); the future resolves to the reply line"""
+        received = time.perf_counter()
+        future = self.loop.create_future()
+        if len(self.queue) >= self.max_pending:
+            future.set_result("ERR 0.00 busy")
+            return future
+        self.queue.append((command, received, future))
+        if not self.drain_scheduled:
+            self.drain_scheduled = True
+            try:
+                self.root.after(0, self.drain)
+            except RuntimeError:
+                # Tk is gone: answer everything queued so no client waits forever
+                self.drain_scheduled = False
+                while self.queue:
+                    _, _, queued = self.queue.popleft()
+                    if not queued.done():
+                        queued.set_result("ERR 0.00 shutting down")
+        return future
+
+    def drain(self):
+        """Run the queued commands in arrival order (Tk thread)"""
+        self.drain_scheduled = False
+        while True:
+            try:
+                command, received, future = self.queue.popleft()
+            except IndexError:
+                break
+            t_handler = time.perf_counter()
+            try:
+                result = self.handle_command(command)
+                status = "OK"
+            except Exception as e:  # A bad command must not take the server down
+                result, status = str(e), "ERR"
+            # Count the time until the canvas change has actually been processed
+            self.root.update_idletasks()
+            t_done = time.perf_counter()
+            self.stats.record(command.split()[0].lower(), received, t_handler, t_done)
+            reply = f"{status} {(t_done - received) * 1000:.2f}" + (f" {result}" if result else "")
+            self.loop.call_soon_threadsafe(future.set_result, reply)
+
+OVL_MAGIC = b"OVL1"
+OVL_HEADER = struct.Struct("<4sHHHHHHBBB")
+
+def decode_ovl(data):
+    """Decode a .ovl overlay: header, one RGB color, zlib-compressed 1-bit alpha mask.
+
+    The header holds the source size and the mask's box inside it (the alpha
+    bounding box), so the result matches decode_overlay_asset's trimmed image.
+    Returns (image, box, source_size).
+    """
+    from PIL import Image
+
+    magic, width, height, left, top, right, bottom, r, g, b = OVL_HEADER.unpack_from(data)
+    if magic != OVL_MAGIC:
+        raise ValueError("not an overlay mask file")
+    size = (right - left, bottom - top)
+    mask = Image.frombytes("1", size, zlib.decompress(data[OVL_HEADER.size:]))
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    image.paste((r, g, b, 255), mask=mask)
+    return image, (left, top, right, bottom), (width, height)
+
+class ImageLRU:
+    """Thread-safe LRU of decoded PIL images bounded by their pixel memory"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def image_bytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, image):
+        """Store value, accounted by the size of image"""
+        size = self.image_bytes(image)
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+class MapRegistry:
+    """Maps described by the asset manifest (assets/maps.json)"""
+
+    FALLBACK_MAP = {"id": "sanhok", "name": "사녹", "image": "assets/overlay_circle.png",
+                    "width": 2475, "height": 2475}
+
+    def __init__(self, maps, default_id):
+        self.maps = OrderedDict((m["id"], m) for m in maps)
+        self.default_id = default_id if default_id in self.maps else next(iter(self.maps))
+
+    @classmethod
+    def load(cls, manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            return cls(manifest["maps"], manifest.get("default"))
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, StopIteration) as e:
+            print(f"Map manifest unavailable ({e}), using bitmap overlay.")
+            return cls([cls.FALLBACK_MAP], cls.FALLBACK_MAP["id"])
+
+    def get(self, map_id):
+        return self.maps.get(map_id, self.maps[self.default_id])
+
+    def ids(self):
+        return list(self.maps)
+
+    def next_id(self, map_id):
+        ids = self.ids()
+        index = ids.index(map_id) if map_id in ids else -1
+        return ids[(index + 1) % len(ids)]
+
+class OverlayVariants:
+    """Index of pre-rendered overlay variants (tools/generate_overlay.py --batch)"""
+
+    def __init__(self, variants, base_dir):
+        self.base_dir = base_dir
+        self.variants = {(v["map"], v["height"], round(v["scale"], 4)): v for v in variants}
+
+    @classmethod
+    def load(cls, index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                variants = json.load(f)["variants"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            variants = []
+        return cls(variants, os.path.dirname(index_path))
+
+    def find(self, map_id, target_height, scale_factor, circle):
+        """Variant rendered for exactly this placement and circle geometry, or None"""
+        variant = self.variants.get((map_id, target_height, round(scale_factor, 4)))
+        if variant is None or variant.get("circle") != circle:
+            return None
+        return variant
+
+    def path_for(self, variant):
+        return os.path.join(self.base_dir, variant["file"])
+
+class ResampleWorker:
+    """Background thread that resamples the overlay, processing only the latest request"""
+
+    def __init__(self, root, resample, on_result):
+        self.root = root
+        self.resample = resample
+        self.on_result = on_result
+        self.condition = threading.Condition()
+        self.pending = None
+        self.generation = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, size, source_image, source_hash):
+        """Queue a resample, replacing any request that has not started yet.
+
+        The source is captured here, so a map switch mid-resample cannot mix one
+        map's cache key with another map's pixels.
+        """
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, size, source_image, source_hash)
+            self.condition.notify()
+            return self.generation
+
+    def cancel(self):
+        """Invalidate pending and in-flight requests"""
+        with self.condition:
+            self.generation += 1
+            self.pending = None
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.pending = None
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                generation, size, source_image, source_hash = self.pending
+                self.pending = None
+
+            try:
+                image = self.resample(size, source_image, source_hash)
+            except Exception as e:
+                print(f"Background resample failed: {e}")
+                continue
+
+            # PhotoImage must be created on the Tk thread
+            try:
+                self.root.after(0, lambda generation=generation, size=size, image=image: self.deliver(generation, size, image))
+            except RuntimeError:
+                return  # Tk main loop is gone
+
+    def deliver(self, generation, size, image):
+        if generation != self.generation:
+            return  # A newer request superseded this one
+        self.on_result(size, image)
+
+class PointerCapture:
+    """Global pointer position and mode keys through pynput listeners.
+
+    Replaces the full-screen capture window: nothing is drawn and the game
+    keeps focus. Listener callbacks run inside the system-wide input hooks, so
+    they only record the latest position and pressed keys; the Tk thread
+    picks them up with a recurring after() poll while capture is active.
+    """
+
+    POLL_MS = 10
+
+    def __init__(self, root, on_move):
+        self.root = root
+        self.on_move = on_move
+        self.lock = threading.Lock()
+        self.position = None
+        self.pressed = []
+        self.keys = {}
+        self.listeners = []
+        self.poll_id = None
+
+    def start(self, keys):
+        """Capture until stop(); keys maps pynput key names ("home", "end", ...) to handlers"""
+        from pynput import keyboard, mouse
+
+        self.stop()
+        self.keys = keys
+        self.listeners = [mouse.Listener(on_move=self.handle_move),
+                          keyboard.Listener(on_press=self.handle_press)]
+        for listener in self.listeners:
+            listener.start()
+        self.poll_id = self.root.after(self.POLL_MS, self.poll)
+
+    def stop(self):
+        for listener in self.listeners:
+            listener.stop()
+        self.listeners = []
+        self.keys = {}
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        with self.lock:
+            self.position = None
+            self.pressed = []
+
+    def handle_move(self, x, y):
+        with self.lock:
+            self.position = (x, y)
+
+    def handle_press(self, key):
+        name = getattr(key, "name", None) or getattr(key, "char", None)
+        if name in self.keys:
+            with self.lock:
+                self.pressed.append(name)
+
+    def poll(self):
+        """Deliver the latest pointer position and queued key presses (Tk thread)"""
+        self.poll_id = None
+        with self.lock:
+            position, self.position = self.position, None
+            pressed, self.pressed = self.pressed, []
+        if position is not None:
+            self.on_move(*position)
+        for name in pressed:
+            if not self.listeners:
+                return  # A handler ended the capture
+            handler = self.keys.get(name)
+            if handler is not None:
+                handler()
+        # A handler may have restarted capture, which schedules its own poll
+        if self.listeners and self.poll_id is None:
+            self.poll_id = self.root.after(self.POLL_MS, self.poll)
+
+class CursorIndicator:
+    """Small topmost window following the pointer: a ring plus an optional label"""
+
+    SIZE = 24
+
+    def __init__(self, root, on_create=None):
+        self.root = root
+        self.on_create = on_create
+        self.window = None
+        self.text = ""
+
+    def create(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.overrideredirect(True)
+        self.window.attributes("-topmost", True)
+        transparent = apply_transparency(self.window)
+        self.window.config(bg=transparent)
+        self.canvas = tk.Canvas(self.window, width=240, height=self.SIZE, bg=transparent, highlightthickness=0)
+        self.canvas.pack()
+        half = self.SIZE // 2
+        self.canvas.create_oval(half - 8, half - 8, half + 8, half + 8, outline="#32A0FF", width=2)
+        self.label = self.canvas.create_text(self.SIZE + 4, half, text="", anchor="w",
+                                             fill="white", font=("Arial", 12, "bold"))
+        if self.on_create:
+            self.on_create(self.window)
+
+    def show(self, x, y):
+        if self.window is None:
+            self.create()
+        self.move(x, y)
+        self.window.deiconify()
+
+    def hide(self):
+        if self.window is not None:
+            self.window.withdraw()
+
+    def move(self, x, y):
+        # Only the window moves; its contents are not redrawn
+        if self.window is not None:
+            half = self.SIZE // 2
+            self.window.geometry(f"+{int(x) - half}+{int(y) - half}")
+
+    def set_text(self, text):
+        if self.window is not None and text != self.text:
+            self.canvas.itemconfig(self.label, text=text)
+            self.text = text
+
+class AnnotationLayer:
+    """Expiry of annotation groups (measurement lines, paths, markers) with one Tk timer.
+
+    Groups are scene name prefixes registered with a TTL. Deadlines sit in a
+    heap; a single after() callback, re-armed for the earliest deadline,
+    expires every due group in one batch. Re-registering or cancelling a
+    prefix invalidates its older heap entry.
+    """
+
+    def __init__(self, root, on_expire):
+        self.root = root
+        self.on_expire = on_expire
+        self.heap = []
+        self.live = {}
+        self.seq = 0
+        self.timer = None
+        self.timer_deadline = None
+
+    def __len__(self):
+        return len(self.live)
+
+    def expire_after(self, prefix, ttl):
+        """Expire the group ttl seconds from now, replacing any earlier deadline"""
+        self.seq += 1
+        deadline = time.monotonic() + ttl
+        self.live[prefix] = self.seq
+        heapq.heappush(self.heap, (deadline, self.seq, prefix))
+        self.arm()
+
+    def cancel(self, prefix):
+        self.live.pop(prefix, None)
+
+    def arm(self):
+        """Point the single timer at the earliest live deadline"""
+        while self.heap and self.live.get(self.heap[0][2]) != self.heap[0][1]:
+            heapq.heappop(self.heap)  # Cancelled or replaced
+        if not self.heap:
+            if self.timer is not None:
+                self.root.after_cancel(self.timer)
+                self.timer = self.timer_deadline = None
+            return
+
+        deadline = self.heap[0][0]
+        if self.timer is not None:
+            if self.timer_deadline <= deadline:
+                return
+            self.root.after_cancel(self.timer)
+        delay_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        self.timer = self.root.after(delay_ms, self.expire)
+        self.timer_deadline = deadline
+
+    def expire(self):
+        self.timer = self.timer_deadline = None
+        now = time.monotonic()
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            _, seq, prefix = heapq.heappop(self.heap)
+            if self.live.get(prefix) == seq:
+                del self.live[prefix]
+                expired.append(prefix)
+        if expired:
+            self.on_expire(expired)
+        self.arm()
+
+class CanvasScene:
+    """Retained layer over a tk.Canvas that owns named items.
+
+    Items are created once and afterwards only moved (coords), reconfigured
+    (itemconfig) or shown/hidden (state). Every canvas call is counted so the
+    cost of each action can be inspected through last_ops/total_ops.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.items = {}
+        self.ops = 0
+        self.last_ops = {}
+        self.total_ops = {}
+        self.depth = 0
+
+    @contextlib.contextmanager
+    def action(self, name):
+        """Attribute canvas operations issued inside the block to an action"""
+        start = self.ops
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            count = self.ops - start
+            self.last_ops[name] = count
+            self.total_ops[name] = self.total_ops.get(name, 0) + count
+
+    def draw(self, name, kind, coords, **options):
+        """Create the named item, or update only what differs from its last state"""
+        coords = tuple(coords)
+        item = self.items.get(name)
+        if item is not None and item["kind"] != kind:
+            self.remove(name)
+            item = None
+
+        if item is None:
+            create = getattr(self.canvas, f"create_{kind}")
+            item_id = create(*coords, **options)
+            self.ops += 1
+            self.items[name] = {"id": item_id, "kind": kind, "coords": coords,
+                                "options": dict(options), "hidden": False}
+            return item_id
+
+        if item["coords"] != coords:
+            self.canvas.coords(item["id"], *coords)
+            self.ops += 1
+            item["coords"] = coords
+
+        changed = {k: v for k, v in options.items() if item["options"].get(k) != v}
+        if changed:
+            self.canvas.itemconfig(item["id"], **changed)
+            self.ops += 1
+            item["options"].update(changed)
+        return item["id"]
+
+    def move(self, name, dx, dy):
+        item = self.items.get(name)
+        if item is None or (dx == 0 and dy == 0):
+            return
+        self.canvas.move(item["id"], dx, dy)
+        self.ops += 1
+        item["coords"] = tuple(c + (dx if i % 2 == 0 else dy) for i, c in enumerate(item["coords"]))
+
+    def show(self, name):
+        self.set_hidden(name, False)
+
+    def hide(self, name):
+        self.set_hidden(name, True)
+
+    def set_hidden(self, name, hidden):
+        item = self.items.get(name)
+        if item is None or item["hidden"] == hidden:
+            return
+        self.canvas.itemconfig(item["id"], state=tk.HIDDEN if hidden else tk.NORMAL)
+        self.ops += 1
+        item["hidden"] = hidden
+
+    def has(self, name):
+        return name in self.items
+
+    def is_shown(self, name):
+        item = self.items.get(name)
+        return item is not None and not item["hidden"]
+
+    def visible_bbox(self):
+        """Union of the visible items' bounding boxes in canvas coordinates, None if nothing is shown"""
+        ids = [item["id"] for item in self.items.values() if not item["hidden"]]
+        return self.canvas.bbox(*ids) if ids else None
+
+    def remove(self, name):
+        item = self.items.pop(name, None)
+        if item is None:
+            return
+        self.canvas.delete(item["id"])
+        self.ops += 1
+
+    def remove_group(self, prefix):
+        """Remove every item whose name starts with prefix"""
+        for name in [n for n in self.items if n.startswith(prefix)]:
+            self.remove(name)
+
+def scene_action(name):
+    """Decorator attributing the canvas operations of an OverlayApp method to an action"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.scene.action(name):
+                result = func(self, *args, **kwargs)
+            # Nested actions leave resizing to the outermost one
+            if self.scene.depth == 0:
+                self.fit_window()
+            return result
+        return wrapper
+    return decorator
+
 class OverlayApp:
-    def __init__(self, root):
+    # pynput key names -> Tk bindings for the capture window fallback
+    CAPTURE_TK_KEYS = {"home": "<Home>", "end": "<End>", "backspace": "<BackSpace>", "insert": "<Insert>"}
+
+    def __init__(self, root, profiler=None, instance_lock=None):
+        load_tk()
         self.root = root
         self.root.title("Map Overlay")
+        self.profiler = profiler or StartupProfiler(enabled=False)
+        self.instance_lock = instance_lock
         
         # Determine Config Path
         self.set_config_path()
         
         # Load Config
         self.config = configparser.ConfigParser()
-        self.load_config()
+        with self.profiler.phase("load_config"):
+            self.load_config()
+        self.config_writer = ConfigWriter(self.config_file)
+
+        # Map registry: geometry and assets per map, decoded lazily on first use
+        self.map_registry = MapRegistry.load(self.resource_path("assets/maps.json"))
+        self.migrate_map_settings()
+        self.map_id = self.config.get("Settings", "map", fallback=self.map_registry.default_id)
+        if self.map_id not in self.map_registry.maps:
+            self.map_id = self.map_registry.default_id
+        self.manifest = self.map_registry.get(self.map_id)
+        self.load_calibration()
 
         # Window setup for transparency and fullscreen
         self.root.attributes("-topmost", True)
@@ -40,45 +1353,73 @@ class OverlayApp:
         if platform.system() == "Windows":
              self.set_click_through()
         
-        # Mac-specific transparency
-        if platform.system() == 'Darwin':
-            self.root.wm_attributes("-transparent", True)
-            self.root.config(bg='systemTransparent')
-        else:
-            # Windows fallback
-            self.root.wm_attributes("-transparentcolor", "black")
-            self.root.config(bg='black')
+        # Color-keyed on Windows, transparent background on Mac, plain black on X11
+        self.root.config(bg=apply_transparency(self.root))
 
         # Get screen dimensions
         self.screen_width = self.root.winfo_screenwidth()
         self.screen_height = self.root.winfo_screenheight()
         self.root.geometry(f"{self.screen_width}x{self.screen_height}+0+0")
 
-        # Load Overlay Image
-        img_path = self.resource_path("assets/overlay_circle.png")
-        try:
-            self.original_image = Image.open(img_path)
-        except FileNotFoundError:
-            print(f"Error: {img_path} not found.")
-            self.root.destroy()
-            return
+        # Raster asset of the current map (bitmap fallback for vector mode)
+        self.overlay_image = None
+
+        # Pre-scaled images survive restarts, so startup and mode switches skip LANCZOS
+        cache_mb = self.config.getint("Cache", "max_mb", fallback=64)
+        self.image_cache = ScaledImageCache(os.path.join(self.config_dir, "cache"), cache_mb * 1024 * 1024)
+
+        # Decoded and scaled images of recently used maps stay in memory up to this budget
+        memory_mb = self.config.getint("Cache", "memory_mb", fallback=96)
+        self.image_lru = ImageLRU(memory_mb * 1024 * 1024)
+
+        # Pre-rendered variants skip decode and resampling when placement matches exactly
+        self.overlay_variants = OverlayVariants.load(self.resource_path("assets/variants/manifest.json"))
         
         # Settings
         self.is_visible = True
-        self.mode = self.config.get("Settings", "mode", fallback="QHD")
+        self.mode = self.config.get("Settings", "mode", fallback="Auto")
+        self.scale_table = load_scale_table(self.config)
+        self.resolve_target_height()
+        self.render_mode = self.config.get("Settings", "render_mode", fallback="vector")
+        if self.render_mode == "vector" and "circle" not in self.manifest:
+            self.render_mode = "raster"
+
+        # LANCZOS runs off the Tk thread; a NEAREST preview is shown meanwhile
+        self.resample_worker = ResampleWorker(self.root, self.get_resized_image, self.on_resample_done)
+
+        # Only decode the bitmap when it will actually be drawn
+        if self.render_mode == "raster":
+            with self.profiler.phase("image_load"):
+                loaded = self.load_overlay_image()
+            if not loaded:
+                self.root.destroy()
+                return
         
         # Scaling factors
         # Scaling factors - Now handled dynamically in get_base_scale
         # self.scale_qhd = 1440 / 2475 * 0.9 
         # self.scale_fhd = 1080 / 2475 * 0.9 
 
-        self.canvas = tk.Canvas(self.root, width=self.screen_width, height=self.screen_height, 
-                                bg='systemTransparent' if platform.system() == 'Darwin' else 'black', 
-                                highlightthickness=0)
-        self.canvas.pack(fill=tk.BOTH, expand=True)
-        
-        self.image_item = None
-        self.update_image()
+        with self.profiler.phase("canvas_setup"):
+            self.canvas = tk.Canvas(self.root, width=self.screen_width, height=self.screen_height, 
+                                    bg='systemTransparent' if platform.system() == 'Darwin' else 'black', 
+                                    highlightthickness=0)
+            self.canvas.pack(fill=tk.BOTH, expand=True)
+            self.scene = CanvasScene(self.canvas)
+
+            # Canvas coordinates stay screen coordinates; a smaller window just scrolls
+            # its view to where it sits on screen (see fit_window)
+            self.canvas.config(scrollregion=(0, 0, self.screen_width, self.screen_height), confine=False)
+            self.compact_window = self.config.getboolean("Settings", "compact_window", fallback=True)
+            self.window_box = (0, 0, self.screen_width, self.screen_height)
+            self.window_area = self.screen_width * self.screen_height
+
+        with self.profiler.phase("resize"):
+            self.update_image()
+
+        # Map the window now so the overlay is on screen before the remaining setup
+        self.root.update_idletasks()
+        self.profiler.mark("first_overlay_visible")
 
         # Distance measurement state
         self.calibration_mode = False
@@ -87,52 +1428,194 @@ class OverlayApp:
         self.measurement_points = []
         self.measurement_line = None
         self.measurement_text = None
+        self.measurement_count = 0
+
+        # Multi-leg path state: per-leg distances kept so undo stays O(1)
+        self.path_mode = False
+        self.path_points = []
+        self.path_legs = []
+        self.path_total = 0.0
+        self.path_count = 0
+
+        # Marking modes read the pointer through global listeners instead of a capture window;
+        # pynput reports physical pixels, the canvas uses Tk's logical ones
+        self.annotations = AnnotationLayer(self.root, self.expire_annotations)
+
+        self.pointer = (0, 0)
+        self.pointer_capture = PointerCapture(
+            self.root, lambda x, y: self.on_pointer_move(x / self.dpi_scale, y / self.dpi_scale)
+        )
+        self.cursor_indicator = CursorIndicator(self.root, on_create=self.set_click_through_window)
+        self.capture_fallback_keys = []
+
+        # Screen -> map km/grid transform, rebuilt lazily by get_map_transform
+        self.map_transform = None
+        self._map_transform_key = None
+
+        # Mark-many state: distance matrix is rebuilt lazily after points change
+        self.mark_many_mode = False
+        self.mark_points = []
+        self.mark_anchor = 0
+        self.mark_count = 0
+
+        # Hotkey latency instrumentation, off unless enabled in [Debug]
+        self.latency_stats = LatencyStats(self.config.getboolean("Debug", "latency_stats", fallback=False))
+
+        # Hotkey presses are queued and coalesced instead of scheduled one by one
+        self.hotkey_dispatcher = HotkeyDispatcher(
+            self.root, self.run_hotkey_action,
+            max_depth=self.config.getint("Settings", "hotkey_queue_size", fallback=32),
+            max_age=self.config.getint("Settings", "hotkey_max_age_ms", fallback=500) / 1000
+        )
+        self.hotkey_dispatcher.start()
 
         # Initial hotkey setup
         self.listener = None
-        self.setup_hotkeys()
+        with self.profiler.phase("setup_hotkeys"):
+            self.setup_hotkeys()
 
-        # System Tray (Windows Only)
-        if platform.system() == "Windows":
-            self.tray_thread = threading.Thread(target=self.setup_tray, daemon=True)
-            self.tray_thread.start()
+        # Tray and settings styles are not needed for the first frame
+        self.styles_ready = False
+        self.root.after(0, self.start_deferred_services)
 
         print("Overlay Started.")
         print(f"Config loaded from: {self.config_file}")
         print("Press F12 to open Settings.")
 
+    def start_deferred_services(self):
+        """Initialize the pieces that are not needed for the first overlay frame"""
+        # System Tray (Windows Only)
+        if platform.system() == "Windows":
+            with self.profiler.phase("tray_thread_start"):
+                self.tray_thread = threading.Thread(target=self.setup_tray, daemon=True)
+                self.tray_thread.start()
+
+        with self.profiler.phase("settings_styles"):
+            self.setup_styles()
+
+        # The control socket doubles as the handoff channel for a second launch;
+        # without [Control] enabled it only accepts what a second launch sends
+        control_enabled = self.config.getboolean("Control", "enabled", fallback=False)
+        if control_enabled or self.instance_lock:
+            with self.profiler.phase("control_server"):
+                if control_enabled:
+                    self.control_server = ControlServer(self.root, self.handle_control_command)
+                    address = self.control_server.start(
+                        self.config.get("Control", "host", fallback="127.0.0.1"),
+                        self.config.getint("Control", "port", fallback=47815),
+                        self.config.get("Control", "unix_socket", fallback="") or None
+                    )
+                else:
+                    self.control_server = ControlServer(self.root, self.handle_handoff_command)
+                    address = self.control_server.start("127.0.0.1", 0)
+                if address and self.instance_lock:
+                    self.instance_lock.publish(address)
+
+        self.profiler.mark("startup_complete")
+        self.profiler.write_report(os.path.join(self.config_dir, "startup_profile.txt"))
+
     def set_config_path(self):
-        app_name = "PUBG_Map_Overlay"
-        system = platform.system()
-        
-        if system == "Windows":
-            base_dir = os.getenv("LOCALAPPDATA")
-            if not base_dir: # Fallback
-                base_dir = os.path.expanduser("~\\AppData\\Local")
-        elif system == "Darwin":
-            base_dir = os.path.expanduser("~/Library/Application Support")
-        else: # Linux/Other
-            base_dir = os.path.expanduser("~/.config")
-            
-        self.config_dir = os.path.join(base_dir, app_name)
+        self.config_dir = default_config_dir()
         
         # Create directory if it doesn't exist
         os.makedirs(self.config_dir, exist_ok=True)
         self.config_file = os.path.join(self.config_dir, "config.ini")
 
     def resource_path(self, relative_path):
-        """ Get absolute path to resource, works for dev and for PyInstaller """
+        return resource_path(relative_path)
+
+    def load_overlay_image(self):
+        """Decode the raster overlay asset, trimmed to its alpha bounding box.
+
+        The full-size source is released once the trimmed working copy is built;
+        overlay_box records where the working copy sits inside the source.
+        Decoded assets are kept in image_lru, so switching back to a recent map
+        does not decode again. Returns False if the asset is missing.
+        """
+        if self.overlay_image is not None:
+            return True
+
+        asset = self.image_lru.get(("source", self.map_id))
+        if asset is None:
+            asset = self.decode_overlay_asset()
+            if asset is None:
+                return False
+            self.image_lru.put(("source", self.map_id), asset, asset[0])
+
+        self.overlay_image, self.overlay_box, self.source_size, self.source_hash = asset
+        return True
+
+    def decode_overlay_asset(self):
+        from PIL import Image
+
+        if self.manifest.get("mask"):
+            asset = self.decode_overlay_mask(self.resource_path(self.manifest["mask"]))
+            if asset is not None:
+                return asset
+
+        img_path = self.resource_path(self.manifest.get("image", "assets/overlay_circle.png"))
+        try:
+            with open(img_path, "rb") as f:
+                image_bytes = f.read()
+        except FileNotFoundError:
+            print(f"Error: {img_path} not found.")
+            return None
+        source = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
+        source_size = source.size
+
+        # Transparent margins never need to be resized or converted to a PhotoImage
+        box = source.getchannel("A").getbbox() or (0, 0, 1, 1)
+        trimmed = source.crop(box)
+        source.close()
+        del source
+
+        # Crop box is part of the key so cache entries never mix trimmed and untrimmed images
+        source_hash = "{}_{}-{}-{}-{}".format(hashlib.sha256(image_bytes).hexdigest()[:16], *box)
+
+        full_bytes = source_size[0] * source_size[1] * 4
+        trimmed_bytes = trimmed.width * trimmed.height * 4
+        print(f"[DEBUG] Overlay trimmed {source_size[0]}x{source_size[1]} -> "
+              f"{trimmed.width}x{trimmed.height} at {box[:2]}: "
+              f"{full_bytes / 1048576:.1f}MB -> {trimmed_bytes / 1048576:.1f}MB resident")
+        return trimmed, box, source_size, source_hash
+
+    def decode_overlay_mask(self, mask_path):
+        """Load the compact .ovl form of the overlay, None if it is missing or unreadable"""
         try:
-            base_path = sys._MEIPASS
-        except Exception:
-            base_path = os.path.abspath(".")
-        return os.path.join(base_path, relative_path)
+            with open(mask_path, "rb") as f:
+                data = f.read()
+            trimmed, box, source_size = decode_ovl(data)
+        except (OSError, ValueError, struct.error, zlib.error) as e:
+            print(f"Overlay mask unavailable ({e}), decoding PNG.")
+            return None
+        source_hash = "{}_{}-{}-{}-{}".format(hashlib.sha256(data).hexdigest()[:16], *box)
+        return trimmed, box, source_size, source_hash
+
+    def map_section(self):
+        return f"Map.{self.map_id}"
+
+    def load_calibration(self):
+        """Parse the current map's calibration into the typed snapshot"""
+        self.calibration = MapCalibration.from_config(
+            self.config, self.map_section(), self.manifest.get("calibration", {})
+        )
+
+    def update_calibration(self, **values):
+        """Update the calibration snapshot and the config object (not written to disk)"""
+        for key, value in values.items():
+            setattr(self.calibration, key, value)
+        self.calibration.validate()
+        # Only the given fields: an unsaved settings preview must not reach config.ini
+        self.calibration.write_to(self.config, self.map_section(), values)
+
+    def migrate_map_settings(self):
+        migrate_map_settings(self.config, self.map_registry.default_id)
 
     def load_config(self):
         if not os.path.exists(self.config_file):
             self.create_default_config()
         else:
-            self.config.read(self.config_file)
+            self.config.read(self.config_file, encoding="utf-8")
             # Check version
             if self.config.get("Settings", "version", fallback="0.0") != CONFIG_VERSION:
                 print("Config version mismatch. Recreating config.")
@@ -142,18 +1625,20 @@ class OverlayApp:
             self.create_default_config()
 
     def create_default_config(self):
-        self.config["Settings"] = {"mode": "QHD", "version": CONFIG_VERSION}
+        self.config["Settings"] = {"mode": "Auto", "version": CONFIG_VERSION}
         self.config["Hotkeys"] = {
             "toggle_visibility": "<f8>",
             "open_settings": "<f12>",
             "measure_distance": "\\",
-            "calibrate_mode": "<shift>+\\"
+            "calibrate_mode": "<shift>+\\",
+            "switch_map": "<f9>",
+            "measure_path": "<ctrl>+\\",
+            "mark_many": "<alt>+\\"
         }
         self.config["Calibration"] = {
             "pixels_per_km": "0.0"
         }
-        with open(self.config_file, "w") as configfile:
-            self.config.write(configfile)
+        ConfigWriter.write_atomic(self.config_file, ConfigWriter.serialize(self.config))
 
     def setup_hotkeys(self):
         if self.listener:
@@ -163,33 +1648,157 @@ class OverlayApp:
         self.hotkey_settings = self.config.get("Hotkeys", "open_settings", fallback="<f12>")
         self.hotkey_measure = self.config.get("Hotkeys", "measure_distance", fallback="\\")
         self.hotkey_calibrate = self.config.get("Hotkeys", "calibrate_mode", fallback="<shift>+\\")
+        self.hotkey_switch_map = self.config.get("Hotkeys", "switch_map", fallback="<f9>")
+        self.hotkey_path = self.config.get("Hotkeys", "measure_path", fallback="<ctrl>+\\")
+        self.hotkey_mark_many = self.config.get("Hotkeys", "mark_many", fallback="<alt>+\\")
+
+        self.hotkey_actions = {
+            "toggle_visibility": self.toggle_visibility,
+            "open_settings": self.open_settings_window,
+            "measure_distance": self.toggle_measurement_mode,
+            "calibrate_mode": self.start_calibration_mode,
+            "switch_map": self.cycle_map,
+            "measure_path": self.toggle_path_mode,
+            "mark_many": self.toggle_mark_many_mode
+        }
 
         try:
+            from pynput import keyboard
+
+            # Listener thread only posts to the dispatcher, Tk runs the actions
+            post = self.hotkey_dispatcher.post
             self.listener = keyboard.GlobalHotKeys({
-                self.hotkey_visible: lambda: self.root.after(0, self.toggle_visibility),
-                self.hotkey_settings: lambda: self.root.after(0, self.open_settings_window),
-                self.hotkey_measure: lambda: self.root.after(0, self.toggle_measurement_mode),
-                self.hotkey_calibrate: lambda: self.root.after(0, self.start_calibration_mode)
+                self.hotkey_visible: lambda: post("toggle_visibility"),
+                self.hotkey_settings: lambda: post("open_settings"),
+                self.hotkey_measure: lambda: post("measure_distance"),
+                self.hotkey_calibrate: lambda: post("calibrate_mode"),
+                self.hotkey_switch_map: lambda: post("switch_map"),
+                self.hotkey_path: lambda: post("measure_path"),
+                self.hotkey_mark_many: lambda: post("mark_many")
             })
             self.listener.start()
         except ValueError as e:
             print(f"Error setting up hotkeys: {e}")
 
-    def set_click_through(self):
+    def run_hotkey_action(self, action, posted_at):
+        """Run a dispatched hotkey action (Tk thread), recording latency when enabled"""
+        t_handler = self.latency_stats.now()
+        self.hotkey_actions[action]()
+        if t_handler is None:
+            return
+        # Count the time until the canvas change has actually been processed
+        self.root.update_idletasks()
+        self.latency_stats.record(action, posted_at, t_handler, time.perf_counter())
+
+    def handle_handoff_command(self, command):
+        """Requests a second launch may forward when the full control socket is disabled"""
+        if command == "ping":
+            return "pong"
+        if command == "action open_settings":
+            self.open_settings_window()
+            return ""
+        raise RuntimeError("control socket disabled")
+
+    def handle_control_command(self, command):
+        """Run one control socket command (Tk thread) and return the reply payload.
+
+        ping | toggle | offset X Y | scale F | mode Auto|QHD|FHD | mark X Y |
+        measure [X1 Y1 X2 Y2] | action NAME | stats
+        """
+        name, *args = command.split()
+        name = name.lower()
+        try:
+            if name == "ping":
+                return "pong"
+            if name == "toggle":
+                self.toggle_visibility()
+                return "visible" if self.is_visible else "hidden"
+            if name == "offset":
+                self.update_calibration(offset_x=int(args[0]), offset_y=int(args[1]))
+            elif name == "scale":
+                self.update_calibration(scale_factor=float(args[0]))
+            elif name == "mode":
+                if args[0] not in ("Auto", "QHD", "FHD"):
+                    raise ValueError
+                self.mode = args[0]
+                self.config.set("Settings", "mode", self.mode)
+                self.resolve_target_height()
+            elif name == "mark":
+                if not (self.calibration_mode or self.measurement_mode or self.path_mode or self.mark_many_mode):
+                    raise RuntimeError("no marking mode active")
+                self.pointer = (float(args[0]), float(args[1]))
+                self.handle_mark_point()
+                return ""
+            elif name == "measure" and args:
+                p1 = (float(args[0]), float(args[1]))
+                p2 = (float(args[2]), float(args[3]))
+                transform = self.get_map_transform()
+                return (f"{self.calculate_distance(p1, p2):.1f}m "
+                        f"{transform.grid_cell(*p1) or '-'} {transform.grid_cell(*p2) or '-'}")
+            elif name == "measure":
+                self.toggle_measurement_mode()
+                return "on" if self.measurement_mode else "off"
+            elif name == "action":
+                self.hotkey_actions[args[0]]()
+                return ""
+            elif name == "stats":
+                return " | ".join(self.control_server.stats.summary_lines() + self.latency_stats.summary_lines()
+                                  + self.hotkey_dispatcher.summary_lines())
+            else:
+                raise RuntimeError(f"unknown command {name!r}")
+        except (IndexError, ValueError, KeyError):
+            raise RuntimeError(f"bad arguments for {name!r}")
+
+        # offset / scale / mode
+        self.update_image()
+        self.save_config_file()
+        return ""
+
+    def set_click_through_window(self, window):
+        """Make a helper window ignore the mouse (Windows only)"""
+        if platform.system() == "Windows":
+            window.update_idletasks()
+            self.set_click_through(window)
+
+    def set_click_through(self, window=None):
+        from ctypes import windll
+
+        window = window or self.root
         try:
             # GWL_EXSTYLE = -20
             # WS_EX_LAYERED = 0x80000
             # WS_EX_TRANSPARENT = 0x20
             # WS_EX_NOACTIVATE = 0x08000000 (Prevents stealing focus)
             
-            hwnd = windll.user32.GetParent(self.root.winfo_id())
+            hwnd = windll.user32.GetParent(window.winfo_id())
             style = windll.user32.GetWindowLongW(hwnd, -20)
             style = style | 0x80000 | 0x20 | 0x08000000
             windll.user32.SetWindowLongW(hwnd, -20, style)
         except Exception as e:
             print(f"Failed to set click-through: {e}")
 
+    def disable_click_through(self):
+        from ctypes import windll
+
+        try:
+            hwnd = windll.user32.GetParent(self.root.winfo_id())
+            style = windll.user32.GetWindowLongW(hwnd, -20)
+            # Remove WS_EX_TRANSPARENT and WS_EX_NOACTIVATE
+            style = style & ~0x20 & ~0x08000000
+            windll.user32.SetWindowLongW(hwnd, -20, style)
+            
+            # Force window to be visible and receive clicks
+            windll.user32.ShowWindow(hwnd, 5)  # SW_SHOW
+            windll.user32.BringWindowToTop(hwnd)
+            windll.user32.UpdateWindow(hwnd)
+            self.root.focus_force()
+        except Exception as e:
+            print(f"Failed to disable click-through: {e}")
+
     def setup_tray(self):
+        import pystray
+        from PIL import Image
+
         # Try to load custom icon, fallback to overlay circle if missing
         try:
             icon_path = self.resource_path("assets/icon.ico")
@@ -210,40 +1819,255 @@ class OverlayApp:
     def quit_app_tray(self, icon, item):
         self.root.after(0, self.quit_app)
 
+    def get_target_height(self):
+        """On-screen height of the full overlay image for the current mode"""
+        return self.target_height
+
+    def get_dpi_scale(self):
+        """Windows display scaling applied to this (DPI-unaware) window; [Settings] dpi_scale overrides"""
+        override = self.config.getfloat("Settings", "dpi_scale", fallback=0.0)
+        if override > 0:
+            return override
+        if platform.system() != "Windows":
+            return 1.0
+        try:
+            from ctypes import windll
+            if windll.user32.IsProcessDPIAware():
+                return 1.0
+            return windll.shcore.GetScaleFactorForDevice(0) / 100 or 1.0
+        except (ImportError, AttributeError, OSError):
+            return 1.0
+
+    def resolve_target_height(self):
+        """Compute the target height once per mode change instead of per frame.
+
+        Auto uses the game's render height ([Settings] render_height, default the
+        physical screen height) looked up in the scale table, converted back to
+        this window's logical pixels.
+        """
+        dpi_scale = self.dpi_scale = self.get_dpi_scale()
+        render_height = self.config.getint("Settings", "render_height", fallback=0)
+        if render_height <= 0:
+            render_height = round(self.screen_height * dpi_scale)
+        self.render_height = render_height
+
+        self.target_height = target_height_for(self.mode, render_height, self.scale_table, dpi_scale)
+        if self.mode not in ("QHD", "FHD"):
+            print(f"[DEBUG] Auto resolution: render height {render_height}, DPI scale {dpi_scale:g}, "
+                  f"target height {self.target_height:g}")
+
     def get_base_scale(self):
         # Calculate base scale based on mode (Target Height / Image Height)
-        # Image height is 2475
-        target_height = 1440 if self.mode == "QHD" else 1080
-        return target_height / 2475
+        return self.get_target_height() / self.manifest.get("height", 2475)
 
+    @scene_action("update_image")
     def update_image(self):
         # Get calibration values
-        scale_factor = self.config.getfloat("Settings", "scale_factor", fallback=1.0)
-        offset_x = self.config.getint("Settings", "offset_x", fallback=0)
-        offset_y = self.config.getint("Settings", "offset_y", fallback=0)
+        scale_factor = self.calibration.scale_factor
+        offset_x = self.calibration.offset_x
+        offset_y = self.calibration.offset_y
 
         base_scale = self.get_base_scale()
         final_scale = base_scale * scale_factor
-            
-        new_width = int(self.original_image.width * final_scale)
-        new_height = int(self.original_image.height * final_scale)
-        
-        # Optimization: Only resize if dimensions changed significantly
-        if not hasattr(self, '_cached_image_dims') or self._cached_image_dims != (new_width, new_height):
-             resized_img = self.original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-             self.tk_image = ImageTk.PhotoImage(resized_img)
-             self._cached_image_dims = (new_width, new_height)
-        
+
         # Center of screen + Offset
         x = (self.screen_width // 2) + offset_x
         y = (self.screen_height // 2) + offset_y
+
+        if not self.is_visible:
+            self.scene.hide("overlay")
+            return
+
+        if self.render_mode == "vector":
+            self.draw_vector_overlay(x, y, final_scale)
+            self.scene.show("overlay")
+            return
+
+        if self.draw_overlay_variant(x, y, final_scale):
+            return
+
+        if not self.load_overlay_image():
+            return
+
+        from PIL import Image, ImageTk
+
+        new_width = max(1, round(self.overlay_image.width * final_scale))
+        new_height = max(1, round(self.overlay_image.height * final_scale))
         
-        if self.image_item:
-            self.canvas.delete(self.image_item)
-            
-        if self.is_visible:
-            self.image_item = self.canvas.create_image(x, y, image=self.tk_image, anchor=tk.CENTER)
+        # Optimization: Only resize if dimensions changed significantly
+        if not hasattr(self, '_cached_image_dims') or self._cached_image_dims != (new_width, new_height):
+            size = (new_width, new_height)
+            cached = self.get_cached_resized_image(size, self.source_hash)
+            if cached is not None:
+                self.resample_worker.cancel()
+                self.tk_image = ImageTk.PhotoImage(cached)
+            else:
+                # Cheap preview now, high quality result swapped in by on_resample_done
+                preview_img = self.overlay_image.resize(size, Image.Resampling.NEAREST)
+                self.tk_image = ImageTk.PhotoImage(preview_img)
+                self.resample_worker.submit(size, self.overlay_image, self.source_hash)
+            self._cached_image_dims = size
+
+        # Shift from the source center to the trimmed region's center
+        left, top, right, bottom = self.overlay_box
+        src_width, src_height = self.source_size
+        x += ((left + right) / 2 - src_width / 2) * final_scale
+        y += ((top + bottom) / 2 - src_height / 2) * final_scale
+
+        self.scene.draw("overlay", "image", (x, y), image=self.tk_image, anchor=tk.CENTER)
+        self.scene.show("overlay")
+
+    def draw_vector_overlay(self, x, y, final_scale):
+        """Draw the zone circle with canvas primitives, (x, y) being the overlay center"""
+        circle = self.manifest["circle"]
+        width = self.manifest.get("width", 2475)
+        height = self.manifest.get("height", 2475)
+
+        # Circle center relative to the overlay center, in screen pixels
+        cx = x + (circle["cx"] - width / 2) * final_scale
+        cy = y + (circle["cy"] - height / 2) * final_scale
+
+        # ImageDraw strokes inwards from the bounding box, Tk centers the stroke on it
+        thickness = circle.get("thickness", 5)
+        r = (circle["r"] - thickness / 2) * final_scale
+        self.scene.draw(
+            "overlay", "oval", (cx - r, cy - r, cx + r, cy + r),
+            outline=circle.get("color", "#FF3250"),
+            width=max(1, round(thickness * final_scale))
+        )
+
+    def draw_overlay_variant(self, x, y, final_scale):
+        """Show a pre-rendered variant for the current placement; False if there is none"""
+        variant = self.overlay_variants.find(
+            self.map_id, self.get_target_height(), self.calibration.scale_factor, self.manifest.get("circle")
+        )
+        if variant is None:
+            return False
+
+        path = self.overlay_variants.path_for(variant)
+        # Tagged so on_resample_done never swaps a stale resample over the variant
+        dims = ("variant", path)
+        if getattr(self, '_cached_image_dims', None) != dims:
+            from PIL import Image, ImageTk
+
+            image = self.image_lru.get(dims)
+            if image is None:
+                try:
+                    with Image.open(path) as f:
+                        image = f.convert("RGBA")
+                except (FileNotFoundError, OSError) as e:
+                    print(f"Overlay variant unavailable ({e}), resampling instead.")
+                    return False
+                self.image_lru.put(dims, image, image)
+            self.resample_worker.cancel()
+            self.tk_image = ImageTk.PhotoImage(image)
+            self._cached_image_dims = dims
+
+        dx, dy = variant["center"]
+        self.scene.draw("overlay", "image", (x + dx * final_scale, y + dy * final_scale),
+                        image=self.tk_image, anchor=tk.CENTER)
+        self.scene.show("overlay")
+        return True
+
+    def fit_window(self):
+        """Shrink the window to the visible content, full screen while the capture layer is up.
+
+        A full-screen topmost layered window is composited every game frame;
+        the overlay itself only needs its bounding box.
+        """
+        if not self.compact_window:
+            return
+        if self.scene.is_shown("capture"):
+            box = (0, 0, self.screen_width, self.screen_height)
+        else:
+            bbox = self.scene.visible_bbox()
+            if bbox is None:
+                box = (0, 0, 1, 1)
+            else:
+                pad = 2
+                box = (max(0, bbox[0] - pad), max(0, bbox[1] - pad),
+                       min(self.screen_width, bbox[2] + pad), min(self.screen_height, bbox[3] + pad))
+                if box[2] <= box[0] or box[3] <= box[1]:
+                    box = (0, 0, 1, 1)
+        if box == self.window_box:
+            return
+
+        self.window_box = box
+        x0, y0, x1, y1 = box
+        self.root.geometry(f"{x1 - x0}x{y1 - y0}+{x0}+{y0}")
+        self.canvas.xview_moveto(x0 / self.screen_width)
+        self.canvas.yview_moveto(y0 / self.screen_height)
+        self.window_area = (x1 - x0) * (y1 - y0)
+        print(f"[DEBUG] Window {x1 - x0}x{y1 - y0}+{x0}+{y0} "
+              f"({self.window_area / (self.screen_width * self.screen_height):.0%} of screen)")
+
+    def on_resample_done(self, size, image):
+        """Swap the high quality resample in for the preview (Tk thread)"""
+        if getattr(self, '_cached_image_dims', None) != size:
+            return
+
+        from PIL import ImageTk
+
+        self.tk_image = ImageTk.PhotoImage(image)
+        if self.render_mode == "raster" and self.scene.has("overlay"):
+            with self.scene.action("resample_done"):
+                self.scene.draw("overlay", "image", self.scene.items["overlay"]["coords"],
+                                image=self.tk_image, anchor=tk.CENTER)
+
+    def get_cached_resized_image(self, size, source_hash):
+        """LANCZOS resize from the memory or disk cache, None if it has to be computed"""
+        from PIL import Image
+
+        key = self.image_cache.make_key(source_hash, size, Image.Resampling.LANCZOS)
+        image = self.image_lru.get(("scaled", key))
+        if image is None:
+            image = self.image_cache.get(key)
+            if image is not None:
+                self.image_lru.put(("scaled", key), image, image)
+        return image
+
+    def get_resized_image(self, size, source_image, source_hash):
+        """Return source_image resized to size, using the memory and disk caches when possible"""
+        from PIL import Image
+
+        image = self.get_cached_resized_image(size, source_hash)
+        if image is not None:
+            return image
+
+        key = self.image_cache.make_key(source_hash, size, Image.Resampling.LANCZOS)
+        start = time.perf_counter()
+        image = source_image.resize(size, Image.Resampling.LANCZOS)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"[DEBUG] Resized {source_image.width}x{source_image.height} -> "
+              f"{size[0]}x{size[1]} in {elapsed_ms:.1f}ms")
+        self.image_cache.put(key, image)
+        self.image_lru.put(("scaled", key), image, image)
+        return image
+
+    def cycle_map(self):
+        self.switch_map(self.map_registry.next_id(self.map_id))
+
+    def switch_map(self, map_id):
+        """Make map_id the active overlay; its asset is decoded on first use only"""
+        if map_id == self.map_id:
+            return
+        self.resample_worker.cancel()
+        self.map_id = map_id
+        self.manifest = self.map_registry.get(map_id)
+        self.load_calibration()
+        self.overlay_image = None
+        self._cached_image_dims = None
+        if self.config.get("Settings", "render_mode", fallback="vector") == "vector" and "circle" in self.manifest:
+            self.render_mode = "vector"
+        else:
+            self.render_mode = "raster"
 
+        self.config.set("Settings", "map", map_id)
+        self.save_config_file()
+        self.update_image()
+        print(f"Switched map to {self.manifest.get('name', map_id)}")
+
+    @scene_action("toggle_visibility")
     def toggle_visibility(self):
         self.is_visible = not self.is_visible
         if self.is_visible:
@@ -270,56 +2094,38 @@ class OverlayApp:
         except:
             pass
 
+        self.hotkey_dispatcher.stop()
+        self.resample_worker.stop()
+        if getattr(self, 'control_server', None):
+            self.control_server.stop()
+        if self.instance_lock:
+            self.instance_lock.unpublish()
+
+        # Pending config changes must reach disk before exit
+        self.config_writer.stop()
+
         self.root.quit()
         self.root.destroy()
         sys.exit(0)
 
+    @scene_action("start_calibration_mode")
     def start_calibration_mode(self):
         """Start calibration mode to set 1km baseline"""
-        print("Calibration mode started. Click two points 1km apart.")
+        self.exit_active_capture_mode()
+        print("Calibration mode started. Press Home on two points 1km apart.")
         self.calibration_mode = True
         self.calibration_points = []
-        
-        # Hide overlay during calibration
-        if self.image_item:
-            self.canvas.delete(self.image_item)
-            self.image_item = None
-        
-        # Disable click-through temporarily
-        if platform.system() == "Windows":
-            try:
-                hwnd = windll.user32.GetParent(self.root.winfo_id())
-                style = windll.user32.GetWindowLongW(hwnd, -20)
-                # Remove WS_EX_TRANSPARENT and WS_EX_NOACTIVATE
-                style = style & ~0x20 & ~0x08000000
-                windll.user32.SetWindowLongW(hwnd, -20, style)
-                
-                # Force window to be visible and receive clicks
-                windll.user32.ShowWindow(hwnd, 5)  # SW_SHOW
-                windll.user32.BringWindowToTop(hwnd)
-                windll.user32.UpdateWindow(hwnd)
-                self.root.focus_force()
-            except Exception as e:
-                print(f"Failed to disable click-through: {e}")
-        
-        # Unbind first to prevent duplicate bindings
-        try:
-            self.root.unbind("<Home>")
-        except:
-            pass
-            
-        # Bind keyboard for marking points (Home key)
-        self.root.bind("<Home>", self.handle_mark_point)
-        print(f"[DEBUG] Calibration mode: Home key bound, calibration_mode={self.calibration_mode}")
-        print(f"[DEBUG] Current focus: {self.root.focus_get()}")
-        
-        # Create a semi-transparent overlay to capture clicks (black is transparent, so use gray)
-        self.calibration_overlay = self.canvas.create_rectangle(
-            0, 0, self.screen_width, self.screen_height,
+        self.enter_capture_mode({})
+
+    def show_capture_layer(self):
+        """Show the full-screen input capture rectangle (fallback when global capture is unavailable)"""
+        self.scene.draw(
+            "capture", "rectangle", (0, 0, self.screen_width, self.screen_height),
             fill="gray", stipple="gray25", outline=""
         )
-        
+        self.scene.show("capture")
 
+    @scene_action("toggle_measurement_mode")
     def toggle_measurement_mode(self):
         """Toggle measurement mode on/off"""
         if self.measurement_mode:
@@ -327,62 +2133,28 @@ class OverlayApp:
             self.exit_measurement_mode()
         else:
             # Enter measurement mode
-            pixels_per_km = self.config.getfloat("Calibration", "pixels_per_km", fallback=0.0)
-            if pixels_per_km <= 0:
+            if self.calibration.pixels_per_km <= 0:
                 print("Please calibrate 1km baseline first!")
                 return
             
-            print("Measurement mode started. Click two points to measure distance.")
+            self.exit_active_capture_mode()
+            print("Measurement mode started. Press Home on two points to measure distance.")
             self.measurement_mode = True
             self.measurement_points = []
-            
-            # Hide overlay during measurement
-            if self.image_item:
-                self.canvas.delete(self.image_item)
-                self.image_item = None
-            
-            # Disable click-through temporarily
-            if platform.system() == "Windows":
-                try:
-                    hwnd = windll.user32.GetParent(self.root.winfo_id())
-                    style = windll.user32.GetWindowLongW(hwnd, -20)
-                    # Remove WS_EX_TRANSPARENT and WS_EX_NOACTIVATE
-                    style = style & ~0x20 & ~0x08000000
-                    windll.user32.SetWindowLongW(hwnd, -20, style)
-                    
-                    # Force window to be visible and receive clicks
-                    windll.user32.ShowWindow(hwnd, 5)  # SW_SHOW
-                    windll.user32.BringWindowToTop(hwnd)
-                    windll.user32.UpdateWindow(hwnd)
-                    self.root.focus_force()
-                except Exception as e:
-                    print(f"Failed to disable click-through: {e}")
-            
-            
-            # Unbind first to prevent duplicate bindings
-            try:
-                self.root.unbind("<Home>")
-            except:
-                pass
-            
-            # Bind keyboard for marking points (Home key)
-            self.root.bind("<Home>", self.handle_mark_point)
-            print(f"[DEBUG] Measurement mode: Home key bound, measurement_mode={self.measurement_mode}")
-            print(f"[DEBUG] Current focus: {self.root.focus_get()}")
-            
-            # Create a semi-transparent overlay to capture clicks
-            self.measurement_overlay = self.canvas.create_rectangle(
-                0, 0, self.screen_width, self.screen_height,
-                fill="gray", stipple="gray25", outline=""
-            )
+            self.enter_capture_mode({})
 
+    def on_pointer_move(self, x, y):
+        """Pointer moved while capturing (canvas/screen coordinates, Tk thread)"""
+        self.pointer = (x, y)
+        self.cursor_indicator.move(x, y)
+        if self.measurement_mode:
+            self.cursor_indicator.set_text(self.cursor_grid_text(x, y))
 
-    def handle_mark_point(self, event):
+    def handle_mark_point(self, event=None):
         """Handle keyboard press to mark point at current cursor position"""
         print(f"[DEBUG] Mark point key pressed!")
-        # Get current mouse position relative to screen
-        x = self.root.winfo_pointerx() - self.root.winfo_rootx()
-        y = self.root.winfo_pointery() - self.root.winfo_rooty()
+        # Canvas coordinates are screen coordinates (see fit_window)
+        x, y = self.pointer
         
         # Create a fake mouse event with cursor position
         class FakeEvent:
@@ -395,6 +2167,7 @@ class OverlayApp:
         # Call the existing click handler
         self.handle_canvas_click(fake_event)
 
+    @scene_action("handle_canvas_click")
     def handle_canvas_click(self, event):
         """Handle canvas clicks for calibration and measurement modes"""
         print(f"[DEBUG] handle_canvas_click called: calibration_mode={self.calibration_mode}, measurement_mode={self.measurement_mode}")
@@ -404,9 +2177,10 @@ class OverlayApp:
             
             # Draw marker
             marker_size = 4
-            self.canvas.create_oval(
-                event.x - marker_size, event.y - marker_size,
-                event.x + marker_size, event.y + marker_size,
+            self.scene.draw(
+                f"marker.{len(self.calibration_points)}", "oval",
+                (event.x - marker_size, event.y - marker_size,
+                 event.x + marker_size, event.y + marker_size),
                 fill="red", outline="white", width=2
             )
             
@@ -417,10 +2191,10 @@ class OverlayApp:
                 pixel_distance = ((x2 - x1)**2 + (y2 - y1)**2)**0.5
                 
                 # Draw line
-                self.canvas.create_line(x1, y1, x2, y2, fill="red", width=3)
+                self.scene.draw("marker.line", "line", (x1, y1, x2, y2), fill="red", width=3)
                 
                 # Save to config
-                self.config.set("Calibration", "pixels_per_km", str(pixel_distance))
+                self.update_calibration(pixels_per_km=pixel_distance)
                 self.save_config_file()
                 
                 print(f"Calibration complete: 1km = {pixel_distance:.2f} pixels")
@@ -428,15 +2202,22 @@ class OverlayApp:
                 # Exit calibration mode after 0.5 seconds
                 self.root.after(500, self.exit_calibration_mode)
         
+        elif self.path_mode:
+            self.add_path_point(event.x, event.y)
+
+        elif self.mark_many_mode:
+            self.add_mark_point(event.x, event.y)
+
         elif self.measurement_mode:
             print(f"[Measurement] Click registered at ({event.x}, {event.y}) - Point {len(self.measurement_points) + 1}/2")
             self.measurement_points.append((event.x, event.y))
             
             # Draw marker
             marker_size = 4
-            self.canvas.create_oval(
-                event.x - marker_size, event.y - marker_size,
-                event.x + marker_size, event.y + marker_size,
+            self.scene.draw(
+                f"marker.{len(self.measurement_points)}", "oval",
+                (event.x - marker_size, event.y - marker_size,
+                 event.x + marker_size, event.y + marker_size),
                 fill="#FF3250", outline="white", width=2
             )
             
@@ -450,16 +2231,22 @@ class OverlayApp:
                 x1, y1 = self.measurement_points[0]
                 x2, y2 = self.measurement_points[1]
                 
+                # Each measurement gets its own names so an older one can expire independently
+                self.measurement_count += 1
+                prefix = f"measure.{self.measurement_count}."
+
                 # Draw line
-                self.measurement_line = self.canvas.create_line(
-                    x1, y1, x2, y2, fill="#FF3250", width=3
+                self.measurement_line = prefix + "line"
+                self.scene.draw(
+                    self.measurement_line, "line", (x1, y1, x2, y2), fill="#FF3250", width=3
                 )
                 
                 # Display distance text next to line
                 mid_x = (x1 + x2) / 2
                 mid_y = (y1 + y2) / 2
-                self.measurement_text = self.canvas.create_text(
-                    mid_x + 20, mid_y - 20,
+                self.measurement_text = prefix + "text"
+                self.scene.draw(
+                    self.measurement_text, "text", (mid_x + 20, mid_y - 20),
                     text=f"{distance_m:.0f}m",
                     fill="#FF3250", font=("Arial", 20, "bold"),
                     anchor="w"
@@ -467,95 +2254,369 @@ class OverlayApp:
                 
                 print(f"Distance: {distance_m:.0f}m")
                 
-                # Exit measurement mode immediately and pass distance data to redraw
-                line_id, text_id = self.exit_measurement_mode(keep_visuals=True, 
-                    distance_data=(x1, y1, x2, y2, distance_m))
+                # Exit measurement mode immediately, leaving line and text in place
+                self.exit_measurement_mode(keep_visuals=True)
                 
-                # Clear distance visuals after 3 seconds
-                self.root.after(3000, lambda: self.clear_distance_visuals(line_id, text_id))
+                # Clear distance visuals after annotation_ttl (3 seconds by default)
+                self.schedule_annotation_clear(prefix)
+
+    @scene_action("toggle_path_mode")
+    def toggle_path_mode(self):
+        """Toggle multi-leg path measurement (pressing again cancels the path)"""
+        if self.path_mode:
+            self.exit_path_mode(keep_visuals=False)
+            return
+
+        if self.calibration.pixels_per_km <= 0:
+            print("Please calibrate 1km baseline first!")
+            return
+
+        self.exit_active_capture_mode()
+        print("Path mode started. Home: add waypoint, BackSpace: undo, End: confirm.")
+        # A previous path kept without TTL is replaced by the new one
+        self.clear_distance_visuals(self.path_prefix())
+        self.path_mode = True
+        self.path_points = []
+        self.path_legs = []
+        self.path_total = 0.0
+        self.path_count += 1
+
+        self.enter_capture_mode({
+            "backspace": self.undo_path_point,
+            "end": lambda: self.exit_path_mode(keep_visuals=True)
+        })
+
+    def enter_capture_mode(self, keys):
+        """Hide the overlay and capture mode keys; Home always marks a point at the pointer.
+
+        keys maps pynput key names to handlers. Input comes from global
+        listeners; if they cannot start, a full-screen capture window is used.
+        """
+        self.scene.hide("overlay")
+        keys = dict(keys, home=self.handle_mark_point)
+        self.pointer = self.root.winfo_pointerxy()
+
+        try:
+            self.pointer_capture.start(keys)
+        except Exception as e:
+            print(f"Global input capture unavailable ({e}), using capture window.")
+            self.start_capture_window(keys)
+
+        self.cursor_indicator.show(*self.pointer)
+        self.cursor_indicator.set_text("")
+        self.on_pointer_move(*self.pointer)
+
+    def start_capture_window(self, keys):
+        """Old capture path: focus a full-screen window and bind the keys on it"""
+        if platform.system() == "Windows":
+            self.disable_click_through()
+        for name, handler in keys.items():
+            sequence = self.CAPTURE_TK_KEYS[name]
+            self.root.bind(sequence, lambda event, handler=handler: handler())
+            self.capture_fallback_keys.append(sequence)
+        self.canvas.bind("<Motion>", lambda event: self.on_pointer_move(event.x, event.y))
+        self.show_capture_layer()
+
+    def exit_active_capture_mode(self):
+        """Cancel the marking mode that currently owns the capture keys, if any"""
+        if self.calibration_mode:
+            self.exit_calibration_mode()
+        if self.measurement_mode:
+            self.exit_measurement_mode()
+        if self.path_mode:
+            self.exit_path_mode(keep_visuals=False)
+        if self.mark_many_mode:
+            self.exit_mark_many_mode(export=False)
+
+    def leave_capture_mode(self):
+        """Undo enter_capture_mode and restore the overlay"""
+        self.pointer_capture.stop()
+        self.cursor_indicator.hide()
+
+        if self.capture_fallback_keys:
+            for sequence in self.capture_fallback_keys:
+                self.root.unbind(sequence)
+            self.capture_fallback_keys = []
+            self.canvas.unbind("<Motion>")
+            self.scene.hide("capture")
+            if platform.system() == "Windows":
+                self.set_click_through()
+        self.update_image()
+
+    def schedule_annotation_clear(self, prefix):
+        """Remove a group of items after annotation_ttl seconds (kept if the TTL is 0)"""
+        ttl = self.config.getfloat("Settings", "annotation_ttl", fallback=3.0)
+        if ttl > 0:
+            self.annotations.expire_after(prefix, ttl)
+        else:
+            self.annotations.cancel(prefix)
+
+    def path_prefix(self):
+        return f"path.{self.path_count}."
+
+    @scene_action("add_path_point")
+    def add_path_point(self, x, y):
+        """Append a waypoint; only the new marker, leg and the total label are touched"""
+        prefix = self.path_prefix()
+        index = len(self.path_points)
+        marker_size = 4
+        self.scene.draw(
+            f"{prefix}marker.{index}", "oval",
+            (x - marker_size, y - marker_size, x + marker_size, y + marker_size),
+            fill="#FF3250", outline="white", width=2
+        )
+
+        if self.path_points:
+            x1, y1 = self.path_points[-1]
+            leg_m = self.calculate_distance((x1, y1), (x, y))
+            self.path_legs.append(leg_m)
+            self.path_total += leg_m
+
+            self.scene.draw(f"{prefix}leg.{index}", "line", (x1, y1, x, y), fill="#FF3250", width=3)
+            self.scene.draw(
+                f"{prefix}label.{index}", "text", ((x1 + x) / 2 + 10, (y1 + y) / 2 - 10),
+                text=f"{leg_m:.0f}m", fill="#FF3250", font=("Arial", 14, "bold"), anchor="w"
+            )
+            print(f"[Path] Leg {index}: {leg_m:.0f}m, total {self.path_total:.0f}m")
+
+        self.path_points.append((x, y))
+        self.draw_path_total()
+
+    @scene_action("undo_path_point")
+    def undo_path_point(self):
+        """Remove the last waypoint and its leg"""
+        if not self.path_mode or not self.path_points:
+            return
+        prefix = self.path_prefix()
+        index = len(self.path_points) - 1
+        self.path_points.pop()
+        self.scene.remove(f"{prefix}marker.{index}")
+        if self.path_legs:
+            self.path_total -= self.path_legs.pop()
+            self.scene.remove(f"{prefix}leg.{index}")
+            self.scene.remove(f"{prefix}label.{index}")
+        if not self.path_legs:
+            self.path_total = 0.0  # Avoid float drift after undoing every leg
+        self.draw_path_total()
+
+    def draw_path_total(self):
+        name = f"{self.path_prefix()}total"
+        if not self.path_legs:
+            self.scene.remove(name)
+            return
+        x, y = self.path_points[-1]
+        self.scene.draw(
+            name, "text", (x + 20, y + 20),
+            text=f"합계 {self.path_total:.0f}m",
+            fill="#FF3250", font=("Arial", 20, "bold"), anchor="w"
+        )
+
+    @scene_action("exit_path_mode")
+    def exit_path_mode(self, keep_visuals=True):
+        """Leave path mode, keeping the path on screen for annotation_ttl seconds"""
+        if not self.path_mode:
+            return
+        self.path_mode = False
+        prefix = self.path_prefix()
+        self.leave_capture_mode()
+
+        if keep_visuals and self.path_legs:
+            print(f"Path confirmed: {len(self.path_legs)} legs, {self.path_total:.0f}m")
+            self.schedule_annotation_clear(prefix)
+        else:
+            self.scene.remove_group(prefix)
+            print("Path mode exited.")
+
+    @scene_action("toggle_mark_many_mode")
+    def toggle_mark_many_mode(self):
+        """Toggle marking many points (squad/enemy positions) with a distance matrix"""
+        if self.mark_many_mode:
+            self.exit_mark_many_mode(export=False)
+            return
+
+        if self.calibration.pixels_per_km <= 0:
+            print("Please calibrate 1km baseline first!")
+            return
+
+        self.exit_active_capture_mode()
+        print("Mark-many mode started. Home: mark, Insert: anchor nearest point, "
+              "BackSpace: undo, End: export CSV.")
+        self.clear_distance_visuals(self.mark_prefix())
+        self.mark_many_mode = True
+        self.mark_points = []
+        self.mark_anchor = 0
+        self.mark_count += 1
+
+        self.enter_capture_mode({
+            "backspace": self.undo_mark_point,
+            "insert": self.set_mark_anchor_at_cursor,
+            "end": lambda: self.exit_mark_many_mode(export=True)
+        })
+
+    def mark_prefix(self):
+        return f"marks.{self.mark_count}."
+
+    @scene_action("add_mark_point")
+    def add_mark_point(self, x, y):
+        index = len(self.mark_points)
+        self.mark_points.append((x, y))
+
+        marker_size = 4
+        self.scene.draw(
+            f"{self.mark_prefix()}marker.{index}", "oval",
+            (x - marker_size, y - marker_size, x + marker_size, y + marker_size),
+            fill="#32A0FF", outline="white", width=2
+        )
+        self.scene.draw(
+            f"{self.mark_prefix()}index.{index}", "text", (x + 8, y - 8),
+            text=str(index + 1), fill="white", font=("Arial", 10, "bold"), anchor="sw"
+        )
+        self.draw_anchor_nearest()
+
+    @scene_action("undo_mark_point")
+    def undo_mark_point(self):
+        if not self.mark_many_mode or not self.mark_points:
+            return
+        index = len(self.mark_points) - 1
+        self.mark_points.pop()
+        self.scene.remove(f"{self.mark_prefix()}marker.{index}")
+        self.scene.remove(f"{self.mark_prefix()}index.{index}")
+        if self.mark_anchor >= len(self.mark_points):
+            self.mark_anchor = 0
+        self.draw_anchor_nearest()
+
+    @scene_action("set_mark_anchor")
+    def set_mark_anchor_at_cursor(self):
+        """Make the marked point closest to the cursor the anchor"""
+        if not self.mark_points:
+            return
+        x, y = self.pointer
+        self.mark_anchor = min(range(len(self.mark_points)),
+                               key=lambda i: (self.mark_points[i][0] - x) ** 2 + (self.mark_points[i][1] - y) ** 2)
+        self.draw_anchor_nearest()
+
+    def draw_anchor_nearest(self):
+        """Highlight the anchor and draw its nearest-neighbor distance"""
+        prefix = self.mark_prefix()
+        if len(self.mark_points) < 2:
+            self.scene.remove(f"{prefix}nearest.line")
+            self.scene.remove(f"{prefix}nearest.text")
+            self.scene.remove(f"{prefix}anchor")
+            return
+
+        # One O(n) row per mark; the full matrix is only built for the export
+        row = distance_row(self.mark_points, self.mark_anchor, self.calibration.pixels_per_km)
+        nearest = min((i for i in range(len(row)) if i != self.mark_anchor), key=row.__getitem__)
+        ax, ay = self.mark_points[self.mark_anchor]
+        nx, ny = self.mark_points[nearest]
+
+        ring = 9
+        self.scene.draw(f"{prefix}anchor", "oval", (ax - ring, ay - ring, ax + ring, ay + ring),
+                        outline="#32A0FF", width=2)
+        self.scene.draw(f"{prefix}nearest.line", "line", (ax, ay, nx, ny), fill="#32A0FF", width=2, dash=(6, 4))
+        self.scene.draw(
+            f"{prefix}nearest.text", "text", ((ax + nx) / 2 + 20, (ay + ny) / 2 - 20),
+            text=f"{self.mark_anchor + 1}→{nearest + 1} {row[nearest]:.0f}m",
+            fill="#32A0FF", font=("Arial", 16, "bold"), anchor="w"
+        )
+
+    @scene_action("exit_mark_many_mode")
+    def exit_mark_many_mode(self, export=True):
+        if not self.mark_many_mode:
+            return
+        self.mark_many_mode = False
+        prefix = self.mark_prefix()
+        self.leave_capture_mode()
+
+        if export and self.mark_points:
+            self.export_distance_matrix()
+            self.schedule_annotation_clear(prefix)
+        else:
+            self.scene.remove_group(prefix)
+        print("Mark-many mode exited.")
+
+    def export_distance_matrix(self):
+        """Write the marked points and their distance matrix (meters) to a CSV in the config dir"""
+        import csv
+
+        matrix = distance_matrix(self.mark_points, self.calibration.pixels_per_km)
+        path = os.path.join(self.config_dir, time.strftime("distances_%Y%m%d_%H%M%S.csv"))
+        labels = [f"P{i + 1}" for i in range(len(self.mark_points))]
+        try:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["point", "x", "y"] + labels)
+                for label, (x, y), row in zip(labels, self.mark_points, matrix):
+                    writer.writerow([label, x, y] + [f"{d:.1f}" for d in row])
+            print(f"Distance matrix ({len(labels)} points) written to {path}")
+        except OSError as e:
+            print(f"Failed to export distance matrix: {e}")
+
+    def get_map_transform(self):
+        """Cached MapTransform, rebuilt only when calibration, mode, map or screen size changed"""
+        calibration = self.calibration
+        key = (self.map_id, self.target_height, calibration.scale_factor, calibration.offset_x,
+               calibration.offset_y, calibration.pixels_per_km, self.screen_width, self.screen_height)
+        if self._map_transform_key != key:
+            self.map_transform = MapTransform.from_overlay(
+                calibration, self.manifest, self.screen_width, self.screen_height,
+                self.get_target_height()
+            )
+            self._map_transform_key = key
+        return self.map_transform
+
+    def cursor_grid_text(self, x, y):
+        """Grid square and map coordinates of a point, shown next to the cursor in measurement mode"""
+        transform = self.get_map_transform()
+        cell = transform.grid_cell(x, y)
+        if cell is None:
+            return ""
+        km_x, km_y = transform.to_km(x, y)
+        return f"{cell}  ({km_x:.2f}, {km_y:.2f}km)"
 
     def calculate_distance(self, point1, point2):
         """Calculate real-world distance in meters between two points"""
-        x1, y1 = point1
-        x2, y2 = point2
-        pixel_distance = ((x2 - x1)**2 + (y2 - y1)**2)**0.5
-        
-        pixels_per_km = self.config.getfloat("Calibration", "pixels_per_km", fallback=1.0)
-        distance_km = pixel_distance / pixels_per_km
-        distance_m = distance_km * 1000
-        
-        return distance_m
+        return distance_m(point1, point2, self.calibration.pixels_per_km or 1.0)
 
+    @scene_action("exit_calibration_mode")
     def exit_calibration_mode(self):
         """Exit calibration mode and restore overlay"""
         self.calibration_mode = False
         self.calibration_points = []
-        self.root.unbind("<Home>")
-        self.canvas.delete("all")
-        
-        # Restore click-through
-        if platform.system() == "Windows":
-            self.set_click_through()
-        
-        # Restore overlay
-        self.update_image()
+        self.scene.remove_group("marker.")
+
+        # Release input and restore overlay
+        self.leave_capture_mode()
         print("Calibration mode exited.")
 
-    def exit_measurement_mode(self, keep_visuals=False, distance_data=None):
+    @scene_action("exit_measurement_mode")
+    def exit_measurement_mode(self, keep_visuals=False):
         """Exit measurement mode and restore overlay"""
         self.measurement_mode = False
         self.measurement_points = []
         
-        # Only unbind if not keeping visuals (fully exiting)
         if not keep_visuals:
-            self.root.unbind("<Home>")
-        
-        # Always delete all canvas items (overlay, markers, old visuals)
-        self.canvas.delete("all")
-        
-        # Restore click-through
-        if platform.system() == "Windows":
-            self.set_click_through()
-        
-        # Restore overlay
-        self.update_image()
-        
-        # Redraw distance visuals if keeping them
-        if keep_visuals and distance_data:
-            x1, y1, x2, y2, distance_m = distance_data
-            
-            # Redraw line
-            line_id = self.canvas.create_line(
-                x1, y1, x2, y2, fill="#FF3250", width=3
-            )
-            
-            # Redraw text
-            mid_x = (x1 + x2) / 2
-            mid_y = (y1 + y2) / 2
-            text_id = self.canvas.create_text(
-                mid_x + 20, mid_y - 20,
-                text=f"{distance_m:.0f}m",
-                fill="#FF3250", font=("Arial", 20, "bold"),
-                anchor="w"
-            )
-            
-            print("Measurement mode exited.")
-            return line_id, text_id
-        else:
             self.measurement_line = None
             self.measurement_text = None
-            print("Measurement mode exited.")
-            return None, None
+        
+        # Markers go away, distance line and text stay untouched
+        self.scene.remove_group("marker.")
+
+        # Release input and restore overlay
+        self.leave_capture_mode()
+        print("Measurement mode exited.")
     
-    def clear_distance_visuals(self, line_id, text_id):
-        """Clear distance measurement visuals after delay"""
-        try:
-            if line_id:
-                self.canvas.delete(line_id)
-            if text_id:
-                self.canvas.delete(text_id)
-        except:
-            pass  # Canvas item may already be deleted
+    @scene_action("clear_distance_visuals")
+    def clear_distance_visuals(self, prefix):
+        """Remove a group of measurement visuals now, dropping its pending expiry"""
+        self.annotations.cancel(prefix)
+        self.scene.remove_group(prefix)
+
+    @scene_action("expire_annotations")
+    def expire_annotations(self, prefixes):
+        """Remove every annotation group whose TTL ran out (one batch per timer tick)"""
+        for prefix in prefixes:
+            self.scene.remove_group(prefix)
 
     def open_settings_window(self):
         if hasattr(self, 'settings_window') and self.settings_window.winfo_exists():
@@ -564,35 +2625,16 @@ class OverlayApp:
 
         self.settings_window = tk.Toplevel(self.root)
         self.settings_window.title("Settings")
-        self.settings_window.geometry("450x600")
+        self.settings_window.geometry("450x720")
         self.settings_window.attributes("-topmost", True)
         self.settings_window.configure(bg="#2b2b2b") # Dark Background
+        self.settings_window.protocol("WM_DELETE_WINDOW", self.close_settings_window)
+        # Slider previews are reverted to this unless Save is pressed
+        self.settings_calibration = (self.map_id, replace(self.calibration))
 
         # --- Style Configuration ---
-        style = ttk.Style(self.settings_window)
-        style.theme_use('clam') 
-
-        # Colors
-        BG_COLOR = "#2b2b2b"
-        FG_COLOR = "#ffffff"
-        ACCENT_COLOR = "#0078d4" 
-        ENTRY_BG = "#3a3a3a"
-        
-        style.configure("TFrame", background=BG_COLOR)
-        style.configure("TLabel", background=BG_COLOR, foreground=FG_COLOR, font=("Segoe UI", 10))
-        style.configure("Header.TLabel", font=("Segoe UI", 16, "bold"))
-        style.configure("TLabelframe", background=BG_COLOR, bordercolor="#444444")
-        style.configure("TLabelframe.Label", background=BG_COLOR, foreground=FG_COLOR, font=("Segoe UI", 10, "bold"))
-        style.configure("TRadiobutton", background=BG_COLOR, foreground=FG_COLOR, indicatorcolor=BG_COLOR, selectcolor=ACCENT_COLOR, font=("Segoe UI", 10))
-        style.map("TRadiobutton", indicatorcolor=[("selected", ACCENT_COLOR)])
-        style.configure("TEntry", fieldbackground=ENTRY_BG, foreground=FG_COLOR, insertcolor=FG_COLOR, borderwidth=0)
-        style.configure("TButton", background="#444444", foreground=FG_COLOR, borderwidth=0, focuscolor=BG_COLOR, font=("Segoe UI", 10))
-        style.map("TButton", background=[("active", "#555555")])
-        style.configure("Accent.TButton", background=ACCENT_COLOR, foreground=FG_COLOR)
-        style.map("Accent.TButton", background=[("active", "#006cc1")])
-        style.configure("TNotebook", background=BG_COLOR, borderwidth=0)
-        style.configure("TNotebook.Tab", background="#444444", foreground=FG_COLOR, padding=[10, 5])
-        style.map("TNotebook.Tab", background=[("selected", ACCENT_COLOR)])
+        if not self.styles_ready:
+            self.setup_styles()
 
         # --- Main Container ---
         main_frame = ttk.Frame(self.settings_window, style="TFrame")
@@ -608,16 +2650,30 @@ class OverlayApp:
         save_btn = ttk.Button(btn_frame, text="Save", command=self.save_settings, style="Accent.TButton")
         save_btn.pack(side="left", expand=True, fill="x", padx=(0, 5), ipady=5)
         
-        close_btn = ttk.Button(btn_frame, text="Close", command=self.settings_window.destroy, style="TButton")
+        close_btn = ttk.Button(btn_frame, text="Close", command=self.close_settings_window, style="TButton")
         close_btn.pack(side="left", expand=True, fill="x", padx=(5, 0), ipady=5)
 
         # --- Tabbed Interface ---
         notebook = ttk.Notebook(main_frame)
         notebook.pack(fill="both", expand=True)
 
-        # === Tab 1: 사녹 (Sanhok - Existing Settings) ===
+        # === Tab 1: Current map (사녹 by default) ===
         sanhok_tab = ttk.Frame(notebook, style="TFrame")
-        notebook.add(sanhok_tab, text="사녹")
+        notebook.add(sanhok_tab, text=self.manifest.get("name", self.map_id))
+
+        # Map
+        if len(self.map_registry.maps) > 1:
+            map_frame = ttk.LabelFrame(sanhok_tab, text="Map", padding=10)
+            map_frame.pack(fill="x", pady=10, padx=10)
+
+            if not hasattr(self, 'var_map'):
+                self.var_map = tk.StringVar(value=self.map_id)
+            else:
+                self.var_map.set(self.map_id)
+
+            for map_id, entry in self.map_registry.maps.items():
+                ttk.Radiobutton(map_frame, text=entry.get("name", map_id), variable=self.var_map,
+                                value=map_id).pack(side="left", padx=10)
 
         # Mode
         mode_frame = ttk.LabelFrame(sanhok_tab, text="Resolution Mode", padding=10)
@@ -628,47 +2684,71 @@ class OverlayApp:
         else:
             self.var_mode.set(self.mode)
             
+        ttk.Radiobutton(mode_frame, text=f"Auto ({self.render_height}p)", variable=self.var_mode, value="Auto").pack(side="left", padx=10)
         ttk.Radiobutton(mode_frame, text="QHD (1440p)", variable=self.var_mode, value="QHD").pack(side="left", padx=10)
         ttk.Radiobutton(mode_frame, text="FHD (1080p)", variable=self.var_mode, value="FHD").pack(side="left", padx=10)
 
+        # Render Mode
+        render_frame = ttk.LabelFrame(sanhok_tab, text="Render Mode", padding=10)
+        render_frame.pack(fill="x", pady=10, padx=10)
+
+        if not hasattr(self, 'var_render_mode'):
+            self.var_render_mode = tk.StringVar(value=self.render_mode)
+        else:
+            self.var_render_mode.set(self.render_mode)
+
+        vector_btn = ttk.Radiobutton(render_frame, text="Vector", variable=self.var_render_mode, value="vector")
+        vector_btn.pack(side="left", padx=10)
+        if "circle" not in self.manifest:
+            vector_btn.state(["disabled"])
+        ttk.Radiobutton(render_frame, text="Bitmap", variable=self.var_render_mode, value="raster").pack(side="left", padx=10)
+
         # Calibration
         calib_frame = ttk.LabelFrame(sanhok_tab, text="Calibration", padding=10)
         calib_frame.pack(fill="x", pady=10, padx=10)
-        
-        defaults = {"scale_factor": 1.0, "offset_x": 0, "offset_y": 0}
-        for label, var_name, conf_key, is_float in [
-            ("Scale Factor", "var_scale", "scale_factor", True),
-            ("Offset X", "var_off_x", "offset_x", False),
-            ("Offset Y", "var_off_y", "offset_y", False)
+
+        for label, var_name, conf_key, is_float, slider_range in [
+            ("Scale Factor", "var_scale", "scale_factor", True, (0.5, 1.5)),
+            ("Offset X", "var_off_x", "offset_x", False, (-500, 500)),
+            ("Offset Y", "var_off_y", "offset_y", False, (-500, 500))
         ]:
             frame = ttk.Frame(calib_frame, style="TFrame")
             frame.pack(fill="x", pady=5)
             ttk.Label(frame, text=label).pack(side="left")
             
-            fb = defaults[conf_key]
-            if is_float:
-                val = self.config.getfloat("Settings", conf_key, fallback=fb)
-            else:
-                val = self.config.getint("Settings", conf_key, fallback=fb)
+            val = getattr(self.calibration, conf_key)
                 
             if not hasattr(self, var_name):
                  setattr(self, var_name, tk.DoubleVar(value=val) if is_float else tk.IntVar(value=val))
+                 # Live preview while dragging or typing
+                 getattr(self, var_name).trace_add("write", self.schedule_calibration_preview)
+            else:
+                 # Map may have changed since the window was last opened
+                 getattr(self, var_name).set(val)
+            var = getattr(self, var_name)
             
-            ttk.Entry(frame, textvariable=getattr(self, var_name), width=10).pack(side="right")
+            ttk.Entry(frame, textvariable=var, width=10).pack(side="right")
+
+            # Slider snaps to 3 decimals / whole pixels so the entry stays readable
+            digits = 3 if is_float else None
+            ttk.Scale(frame, from_=slider_range[0], to=slider_range[1], variable=var, orient="horizontal",
+                      command=lambda v, var=var, digits=digits: var.set(round(float(v), digits))
+                      ).pack(side="right", fill="x", expand=True, padx=10)
 
         # Hotkeys
         hk_frame = ttk.LabelFrame(sanhok_tab, text="Hotkeys", padding=10)
         hk_frame.pack(fill="x", pady=10, padx=10)
 
         self.entries = {}
-        for name, label in [("toggle_visibility", "Toggle On/Off"), 
-                            ("open_settings", "Open Settings")]:
+        for name, label, fallback in [("toggle_visibility", "Toggle On/Off", "<f8>"),
+                                      ("open_settings", "Open Settings", "<f12>"),
+                                      ("switch_map", "Next Map", "<f9>")]:
             
             f = ttk.Frame(hk_frame, style="TFrame")
             f.pack(fill="x", pady=5)
             ttk.Label(f, text=label).pack(side="left")
             
-            current_key = self.config.get("Hotkeys", name)
+            current_key = self.config.get("Hotkeys", name, fallback=fallback)
             entry = ttk.Entry(f, width=15)
             entry.insert(0, current_key)
             entry.pack(side="right")
@@ -687,7 +2767,7 @@ class OverlayApp:
         calib_status_frame = ttk.LabelFrame(distance_tab, text="1km 기준선 설정", padding=10)
         calib_status_frame.pack(fill="x", pady=10, padx=10)
 
-        pixels_per_km = self.config.getfloat("Calibration", "pixels_per_km", fallback=0.0)
+        pixels_per_km = self.calibration.pixels_per_km
         status_text = "설정됨" if pixels_per_km > 0 else "미설정"
         self.calib_status_label = ttk.Label(calib_status_frame, text=f"상태: {status_text}")
         self.calib_status_label.pack(anchor="w", pady=5)
@@ -736,20 +2816,124 @@ class OverlayApp:
 
         self.entries["measure_distance"] = measure_entry
 
+        f_path = ttk.Frame(measure_hk_frame, style="TFrame")
+        f_path.pack(fill="x", pady=5)
+        ttk.Label(f_path, text="경로 측정 모드").pack(side="left")
+
+        current_path_key = self.config.get("Hotkeys", "measure_path", fallback="<ctrl>+\\")
+        path_entry = ttk.Entry(f_path, width=15)
+        path_entry.insert(0, current_path_key)
+        path_entry.pack(side="right")
+
+        path_entry.bind("<FocusIn>", lambda event: path_entry.selection_range(0, tk.END))
+        path_entry.bind("<KeyPress>", lambda event: self.capture_key(event, path_entry))
+        path_entry.bind("<KeyRelease>", lambda event: "break")
+
+        self.entries["measure_path"] = path_entry
+
+        f_marks = ttk.Frame(measure_hk_frame, style="TFrame")
+        f_marks.pack(fill="x", pady=5)
+        ttk.Label(f_marks, text="다중 지점 모드").pack(side="left")
+
+        current_marks_key = self.config.get("Hotkeys", "mark_many", fallback="<alt>+\\")
+        marks_entry = ttk.Entry(f_marks, width=15)
+        marks_entry.insert(0, current_marks_key)
+        marks_entry.pack(side="right")
+
+        marks_entry.bind("<FocusIn>", lambda event: marks_entry.selection_range(0, tk.END))
+        marks_entry.bind("<KeyPress>", lambda event: self.capture_key(event, marks_entry))
+        marks_entry.bind("<KeyRelease>", lambda event: "break")
+
+        self.entries["mark_many"] = marks_entry
+
         # Instructions
         info_frame = ttk.LabelFrame(distance_tab, text="사용 방법", padding=10)
         info_frame.pack(fill="x", pady=10, padx=10)
         
         instructions = [
             "1. 먼저 '1km 기준선 설정' 버튼을 클릭",
-            "2. 게임 내 1km 떨어진 두 지점을 클릭",
+            "2. 게임 내 1km 떨어진 두 지점에서 Home 키",
             "3. 측정 모드 단축키를 눌러 거리 측정 시작",
-            "4. 측정하려는 두 지점을 클릭하면 거리 표시"
+            "4. 측정하려는 두 지점에서 Home 키를 누르면 거리 표시",
+            "5. 경로 측정: Home 지점 추가, BackSpace 되돌리기, End 확정",
+            "6. 다중 지점: Home 지점 추가, Insert 기준점 지정, End CSV 저장"
         ]
         for instruction in instructions:
             ttk.Label(info_frame, text=instruction, font=("Segoe UI", 9)).pack(anchor="w", pady=2)
 
+        # === Tab 3: 지연 시간 (Hotkey Latency) ===
+        latency_tab = ttk.Frame(notebook, style="TFrame")
+        notebook.add(latency_tab, text="지연 시간")
+
+        latency_frame = ttk.LabelFrame(latency_tab, text="단축키 반응 시간", padding=10)
+        latency_frame.pack(fill="both", expand=True, pady=10, padx=10)
+
+        if not hasattr(self, 'var_latency'):
+            self.var_latency = tk.BooleanVar(value=self.latency_stats.enabled)
+        else:
+            self.var_latency.set(self.latency_stats.enabled)
 
+        ttk.Checkbutton(latency_frame, text="측정 활성화", variable=self.var_latency,
+                        command=lambda: setattr(self.latency_stats, "enabled", self.var_latency.get())
+                        ).pack(anchor="w", pady=5)
+
+        latency_label = ttk.Label(latency_frame, text="", font=("Consolas", 9), justify="left", wraplength=360)
+        latency_label.pack(anchor="w", fill="x", pady=5)
+
+        def refresh_latency():
+            lines = self.latency_stats.summary_lines() + [""] + self.hotkey_dispatcher.summary_lines()
+            latency_label.config(text="\n".join(lines))
+
+        refresh_latency()
+
+        latency_btns = ttk.Frame(latency_frame, style="TFrame")
+        latency_btns.pack(fill="x", side="bottom", pady=(10, 0))
+        ttk.Button(latency_btns, text="새로고침", command=refresh_latency).pack(side="left", expand=True, fill="x", padx=(0, 5))
+        ttk.Button(latency_btns, text="파일로 저장", command=self.dump_latency_stats).pack(side="left", expand=True, fill="x", padx=5)
+        ttk.Button(latency_btns, text="초기화", command=lambda: (self.latency_stats.reset(), refresh_latency())
+                   ).pack(side="left", expand=True, fill="x", padx=(5, 0))
+
+    def dump_latency_stats(self):
+        path = os.path.join(self.config_dir, "latency_stats.json")
+        try:
+            self.latency_stats.dump(path)
+            print(f"Latency stats written to {path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to write latency stats: {e}")
+
+
+    def setup_styles(self):
+        """Configure the dark ttk theme used by the settings window"""
+        if self.styles_ready:
+            return
+        style = ttk.Style(self.root)
+        style.theme_use('clam') 
+
+        # Colors
+        BG_COLOR = "#2b2b2b"
+        FG_COLOR = "#ffffff"
+        ACCENT_COLOR = "#0078d4" 
+        ENTRY_BG = "#3a3a3a"
+        
+        style.configure("TFrame", background=BG_COLOR)
+        style.configure("TLabel", background=BG_COLOR, foreground=FG_COLOR, font=("Segoe UI", 10))
+        style.configure("Header.TLabel", font=("Segoe UI", 16, "bold"))
+        style.configure("TLabelframe", background=BG_COLOR, bordercolor="#444444")
+        style.configure("TLabelframe.Label", background=BG_COLOR, foreground=FG_COLOR, font=("Segoe UI", 10, "bold"))
+        style.configure("TRadiobutton", background=BG_COLOR, foreground=FG_COLOR, indicatorcolor=BG_COLOR, selectcolor=ACCENT_COLOR, font=("Segoe UI", 10))
+        style.map("TRadiobutton", indicatorcolor=[("selected", ACCENT_COLOR)])
+        style.configure("TCheckbutton", background=BG_COLOR, foreground=FG_COLOR, indicatorcolor=BG_COLOR, font=("Segoe UI", 10))
+        style.map("TCheckbutton", indicatorcolor=[("selected", ACCENT_COLOR)])
+        style.configure("TEntry", fieldbackground=ENTRY_BG, foreground=FG_COLOR, insertcolor=FG_COLOR, borderwidth=0)
+        style.configure("TButton", background="#444444", foreground=FG_COLOR, borderwidth=0, focuscolor=BG_COLOR, font=("Segoe UI", 10))
+        style.map("TButton", background=[("active", "#555555")])
+        style.configure("Accent.TButton", background=ACCENT_COLOR, foreground=FG_COLOR)
+        style.map("Accent.TButton", background=[("active", "#006cc1")])
+        style.configure("TNotebook", background=BG_COLOR, borderwidth=0)
+        style.configure("TNotebook.Tab", background="#444444", foreground=FG_COLOR, padding=[10, 5])
+        style.map("TNotebook.Tab", background=[("selected", ACCENT_COLOR)])
+
+        self.styles_ready = True
 
     def capture_key(self, event, entry_widget):
         # Ignore modifier keys by themselves
@@ -803,13 +2987,49 @@ class OverlayApp:
         entry_widget.insert(0, final_hotkey)
         return "break"
 
+    def schedule_calibration_preview(self, *args):
+        # Coalesce bursts of variable writes into one redraw
+        if getattr(self, '_preview_pending', None) is None:
+            self._preview_pending = self.root.after_idle(self.preview_calibration)
+
+    def preview_calibration(self):
+        """Apply calibration values to the overlay without writing them to disk"""
+        self._preview_pending = None
+        try:
+            scale = self.var_scale.get()
+            off_x = self.var_off_x.get()
+            off_y = self.var_off_y.get()
+        except tk.TclError:
+            return  # Entry is mid-edit (e.g. empty or "-")
+
+        # Only the snapshot changes; self.config is updated by Save
+        self.calibration.scale_factor = scale
+        self.calibration.offset_x = off_x
+        self.calibration.offset_y = off_y
+        self.calibration.validate()
+        self.update_image()
+
+    def close_settings_window(self):
+        """Close without saving: undo slider previews of the current map"""
+        if getattr(self, '_preview_pending', None) is not None:
+            self.root.after_cancel(self._preview_pending)
+            self._preview_pending = None
+        map_id, saved = self.settings_calibration
+        if map_id == self.map_id:
+            # pixels_per_km may have been calibrated meanwhile, keep it
+            self.calibration.scale_factor = saved.scale_factor
+            self.calibration.offset_x = saved.offset_x
+            self.calibration.offset_y = saved.offset_y
+            self.update_image()
+        self.settings_window.destroy()
+
     def apply_calibration(self):
         try:
             # Update config variables
-            self.config.set("Settings", "scale_factor", str(self.var_scale.get()))
-            self.config.set("Settings", "offset_x", str(self.var_off_x.get()))
-            self.config.set("Settings", "offset_y", str(self.var_off_y.get()))
-        except ValueError:
+            self.update_calibration(scale_factor=self.var_scale.get(),
+                                    offset_x=self.var_off_x.get(),
+                                    offset_y=self.var_off_y.get())
+        except (ValueError, tk.TclError):
             messagebox.showerror("Error", "Invalid calibration values")
 
     def save_settings(self):
@@ -817,17 +3037,33 @@ class OverlayApp:
         if new_mode != self.mode:
             self.mode = new_mode
             self.config.set("Settings", "mode", self.mode)
+            self.resolve_target_height()
             self.update_image()
 
+        new_render_mode = self.var_render_mode.get()
+        if new_render_mode != self.render_mode:
+            self.render_mode = new_render_mode
+            self.config.set("Settings", "render_mode", self.render_mode)
+
         for name, entry in self.entries.items():
             self.config.set("Hotkeys", name, entry.get())
         
+        if hasattr(self, 'var_latency'):
+            if not self.config.has_section("Debug"):
+                self.config.add_section("Debug")
+            self.config.set("Debug", "latency_stats", str(self.var_latency.get()).lower())
+
         # Calibration (Updates config object)
         self.apply_calibration()
         self.update_image()
 
+        # Switch after applying, the calibration fields belong to the previous map
+        if hasattr(self, 'var_map') and self.var_map.get() != self.map_id:
+            self.switch_map(self.var_map.get())
+
         # Write everything to disk
         self.save_config_file()
+        self.settings_calibration = (self.map_id, replace(self.calibration))
 
         # Reload Hotkeys
         self.setup_hotkeys()
@@ -835,10 +3071,126 @@ class OverlayApp:
         print("Configuration Saved!")
 
     def save_config_file(self):
-        with open(self.config_file, "w") as configfile:
-            self.config.write(configfile)
+        # Debounced and written on a background thread, flushed in quit_app
+        self.config_writer.schedule(self.config)
+
+def read_pairs(rows, skipped):
+    """x1,y1,x2,y2 rows -> ((x1, y1), (x2, y2)); headers and malformed rows are counted in skipped[0]"""
+    for row in rows:
+        try:
+            x1, y1, x2, y2 = (float(v) for v in row[:4])
+        except ValueError:  # Also raised for rows with fewer than 4 values
+            skipped[0] += 1
+            continue
+        yield (x1, y1), (x2, y2)
+
+def read_polylines(rows, skipped):
+    """id,x,y rows -> (id, (x, y)); consecutive rows with the same id form one polyline"""
+    for row in rows:
+        if len(row) < 3:
+            skipped[0] += 1
+            continue
+        try:
+            point = (float(row[1]), float(row[2]))
+        except ValueError:
+            skipped[0] += 1
+            continue
+        yield row[0], point
+
+def measure_pairs(pairs, pixels_per_km, transform):
+    for p1, p2 in pairs:
+        yield (*(f"{v:.10g}" for v in (*p1, *p2)), f"{distance_m(p1, p2, pixels_per_km):.1f}",
+               transform.grid_cell(*p1) or "", transform.grid_cell(*p2) or "")
+
+def measure_polylines(points, pixels_per_km, transform):
+    """Per-point leg and running total; only the previous point is kept"""
+    current, previous, total = None, None, 0.0
+    for path_id, point in points:
+        if path_id != current:
+            current, previous, total = path_id, None, 0.0
+        leg = distance_m(previous, point, pixels_per_km) if previous else 0.0
+        total += leg
+        previous = point
+        yield (path_id, f"{point[0]:.10g}", f"{point[1]:.10g}", f"{leg:.1f}", f"{total:.1f}",
+               transform.grid_cell(*point) or "")
+
+def run_distance_cli(argv):
+    """`main.py distance`: stream coordinates through the saved calibration, no Tk window"""
+    import argparse
+    import csv
+
+    parser = argparse.ArgumentParser(
+        prog="main.py distance",
+        description="Distances (m) and grid cells for screen coordinates, using the overlay's calibration."
+    )
+    parser.add_argument("input", nargs="?", default="-", help="CSV file, or - for stdin (default)")
+    parser.add_argument("--polyline", action="store_true",
+                        help="rows are id,x,y; consecutive rows with the same id form a path "
+                             "(default: rows are x1,y1,x2,y2 pairs)")
+    parser.add_argument("--config", default=os.path.join(default_config_dir(), "config.ini"))
+    parser.add_argument("--map", help="map id (default: the map selected in config.ini)")
+    parser.add_argument("--screen", default="2560x1440", help="screen size the coordinates refer to (WxH)")
+    parser.add_argument("--pixels-per-km", type=float, help="override the calibrated 1km length")
+    parser.add_argument("--delimiter", default=",")
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    config.read(args.config, encoding="utf-8")
+    registry = MapRegistry.load(resource_path("assets/maps.json"))
+    migrate_map_settings(config, registry.default_id)
+    map_id = args.map or config.get("Settings", "map", fallback=registry.default_id)
+    manifest = registry.get(map_id)
+    calibration = MapCalibration.from_config(config, f"Map.{manifest['id']}", manifest.get("calibration", {}))
+    if args.pixels_per_km:
+        calibration.pixels_per_km = args.pixels_per_km
+    if calibration.pixels_per_km <= 0:
+        print("No 1km calibration in config; calibrate in the overlay or pass --pixels-per-km.",
+              file=sys.stderr)
+        return 2
+
+    screen_width, screen_height = (int(v) for v in args.screen.lower().split("x"))
+    mode = config.get("Settings", "mode", fallback="Auto")
+    render_height = config.getint("Settings", "render_height", fallback=0) or screen_height
+    transform = MapTransform.from_overlay(
+        calibration, manifest, screen_width, screen_height,
+        target_height_for(mode, render_height, load_scale_table(config))
+    )
+
+    stream = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    try:
+        rows = csv.reader(stream, delimiter=args.delimiter)
+        skipped = [0]
+        if args.polyline:
+            results = measure_polylines(read_polylines(rows, skipped), calibration.pixels_per_km, transform)
+        else:
+            results = measure_pairs(read_pairs(rows, skipped), calibration.pixels_per_km, transform)
+        writer = csv.writer(sys.stdout, delimiter=args.delimiter, lineterminator="\n")
+        writer.writerows(results)
+    except BrokenPipeError:
+        pass  # Output piped into head etc.
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if skipped[0]:
+        print(f"{skipped[0]} rows skipped (header or malformed).", file=sys.stderr)
+    return 0
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = OverlayApp(root)
+    if sys.argv[1:2] == ["distance"]:
+        sys.exit(run_distance_cli(sys.argv[2:]))
+
+    # Decided before Tk, PIL, pystray or pynput are loaded: a second launch only forwards its request
+    instance_lock = InstanceLock(default_config_dir())
+    if not instance_lock.acquire():
+        sys.exit(hand_off_to_running_instance(instance_lock))
+
+    profiler = StartupProfiler(enabled="--profile-startup" in sys.argv)
+    profiler.record("imports", _imports_elapsed)
+    with profiler.phase("tk_init"):
+        root = load_tk().Tk()
+    app = OverlayApp(root, profiler, instance_lock)
+    if "--exit-after-startup" in sys.argv:
+        # Used by build.py to trace imports and time launches: quit once the
+        # deferred services have run and the first frame is drawn
+        root.after(0, lambda: root.after_idle(app.quit_app))
     root.mainloop()
\ No newline at end of file
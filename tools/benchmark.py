@@ -0,0 +1,337 @@
+"""Headless benchmarks for the overlay's render, mode switch and toggle paths.
+
+Drives OverlayApp methods directly. On Linux without a DISPLAY an Xvfb server
+is started for the run. Results (latency percentiles in ms, scene operation
+counts, peak RSS) are printed and can be saved as a JSON baseline to compare
+later commits against (generate the baseline first, it is not checked in yet):
+
+    python tools/benchmark.py --save-baseline tools/benchmark_baseline.json
+    python tools/benchmark.py --baseline tools/benchmark_baseline.json
+
+--assets compares overlay asset decoding (PNG vs .ovl) without a display.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_xvfb(width, height):
+    """Start Xvfb on a free display number and point DISPLAY at it"""
+    if shutil.which("Xvfb") is None:
+        sys.exit("Xvfb not found. Install it (e.g. apt install xvfb) or set DISPLAY.")
+
+    for display in range(99, 120):
+        if os.path.exists(f"/tmp/.X11-unix/X{display}"):
+            continue
+        proc = subprocess.Popen(
+            ["Xvfb", f":{display}", "-screen", "0", f"{width}x{height}x24", "-nolisten", "tcp",
+             "+extension", "RECORD"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        # Wait for the socket so Tk does not race the server
+        for _ in range(50):
+            if os.path.exists(f"/tmp/.X11-unix/X{display}"):
+                os.environ["DISPLAY"] = f":{display}"
+                return proc
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+        proc.kill()
+    sys.exit("Failed to start Xvfb.")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "p50": round(pick(50) * 1000, 3),
+        "p90": round(pick(90) * 1000, 3),
+        "p99": round(pick(99) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+        "n": len(ordered),
+    }
+
+
+def bench_asset_decode(iterations):
+    """Decode time and file size of each map's PNG against its .ovl mask (no display needed)"""
+    import io
+    from PIL import Image
+    import main
+
+    def decode_png(data):
+        # Same work as OverlayApp.decode_overlay_asset
+        source = Image.open(io.BytesIO(data)).convert("RGBA")
+        return source.crop(source.getchannel("A").getbbox() or (0, 0, 1, 1))
+
+    results = {}
+    for entry in main.MapRegistry.load(os.path.join(ROOT_DIR, "assets", "maps.json")).maps.values():
+        formats = {"png": (entry.get("image"), decode_png),
+                   "ovl": (entry.get("mask"), lambda data: main.decode_ovl(data)[0])}
+        for name, (path, decode) in formats.items():
+            if not path or not os.path.exists(os.path.join(ROOT_DIR, path)):
+                continue
+            with open(os.path.join(ROOT_DIR, path), "rb") as f:
+                data = f.read()
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                decode(data)
+                samples.append(time.perf_counter() - start)
+            results[f"{entry['id']}.{name}"] = dict(percentiles(samples), bytes=len(data))
+    return results
+
+
+class Benchmark:
+    def __init__(self, iterations):
+        import tkinter as tk
+        import main
+
+        self.iterations = iterations
+        self.root = tk.Tk()
+        self.app = main.OverlayApp(self.root)
+        # Pending after() callbacks (deferred startup, resample results) run here
+        self.flush()
+        self.results = {}
+
+    def flush(self):
+        self.root.update_idletasks()
+        self.root.update()
+
+    def measure(self, name, step, setup=None):
+        samples = []
+        for i in range(self.iterations):
+            if setup:
+                setup(i)
+            start = time.perf_counter()
+            step(i)
+            self.root.update_idletasks()
+            samples.append(time.perf_counter() - start)
+            # Let background work (e.g. LANCZOS refine) land outside the timed region
+            self.root.update()
+        self.results[name] = percentiles(samples)
+
+    def set_mode(self, render_mode, mode):
+        self.app.render_mode = render_mode
+        self.app.mode = mode
+        self.app.resolve_target_height()
+        self.app._cached_image_dims = None
+
+    def bench_update_image(self):
+        scale_factors = [0.9, 0.95, 1.0, 1.05, 1.1]
+        for render_mode in ("vector", "raster"):
+            for mode in ("QHD", "FHD"):
+                self.set_mode(render_mode, mode)
+
+                def step(i):
+                    self.app.update_calibration(scale_factor=scale_factors[i % len(scale_factors)])
+                    self.app.update_image()
+
+                self.measure(f"update_image.{render_mode}.{mode}", step)
+
+        # Offset-only change: no resample, only a coords update
+        self.set_mode("vector", "QHD")
+        self.app.update_calibration(scale_factor=1.0)
+
+        def offset_step(i):
+            self.app.update_calibration(offset_x=i % 20)
+            self.app.update_image()
+
+        self.measure("update_image.offset_only", offset_step)
+        self.app.update_calibration(offset_x=0)
+
+    def bench_toggle_visibility(self):
+        def step(i):
+            self.app.toggle_visibility()
+            self.app.toggle_visibility()
+
+        self.measure("toggle_visibility.cycle", step)
+
+    def bench_calibration_round_trip(self):
+        def step(i):
+            self.app.start_calibration_mode()
+            self.app.exit_calibration_mode()
+
+        self.measure("calibration.round_trip", step)
+
+    def bench_measurement_cycle(self):
+        self.app.update_calibration(pixels_per_km=300.0)
+        width, height = self.app.screen_width, self.app.screen_height
+
+        def step(i):
+            self.app.toggle_measurement_mode()
+            self.app.handle_canvas_click(SimpleNamespace(x=width // 3, y=height // 3 + i % 50))
+            self.app.handle_canvas_click(SimpleNamespace(x=2 * width // 3, y=2 * height // 3))
+            self.app.clear_distance_visuals(f"measure.{self.app.measurement_count}.")
+
+        self.measure("measurement.cycle", step)
+
+    def bench_mark_many(self, points=120):
+        self.app.update_calibration(pixels_per_km=300.0)
+        width, height = self.app.screen_width, self.app.screen_height
+        coords = [(40 + (k * 97) % (width - 80), 40 + (k * 61) % (height - 80)) for k in range(points)]
+
+        def step(i):
+            self.app.toggle_mark_many_mode()
+            for x, y in coords:
+                self.app.handle_canvas_click(SimpleNamespace(x=x, y=y))
+            self.app.exit_mark_many_mode(export=False)
+
+        self.measure(f"mark_many.{points}_points", step)
+
+    def run(self):
+        self.bench_update_image()
+        self.bench_toggle_visibility()
+        self.bench_calibration_round_trip()
+        self.bench_measurement_cycle()
+        self.bench_mark_many()
+        return {
+            "latency_ms": self.results,
+            "scene_ops": dict(self.app.scene.last_ops),
+            "window_area": self.window_areas(),
+            "peak_rss_mb": peak_rss_mb(),
+            "screen": [self.app.screen_width, self.app.screen_height],
+            "iterations": self.iterations,
+            "python": platform.python_version(),
+        }
+
+    def window_areas(self):
+        """Overlay window area idle vs while capturing input, as a share of the screen"""
+        screen = self.app.screen_width * self.app.screen_height
+        self.app.update_image()
+        self.flush()
+        idle = self.app.window_area
+        self.app.toggle_measurement_mode()
+        self.flush()
+        capture = self.app.window_area
+        self.app.exit_measurement_mode()
+        self.flush()
+        return {"idle_px": idle, "capture_px": capture, "idle_share": round(idle / screen, 4)}
+
+    def close(self):
+        self.app.hotkey_dispatcher.stop()
+        self.app.pointer_capture.stop()
+        self.app.resample_worker.stop()
+        self.app.config_writer.stop()
+        if self.app.listener:
+            self.app.listener.stop()
+        self.root.destroy()
+
+
+def compare(results, baseline, threshold):
+    """Print p50/p90 deltas against a baseline, return the regressed benchmark names"""
+    regressions = []
+    print(f"\n{'benchmark':<32}{'metric':>8}{'base':>10}{'now':>10}{'delta':>9}")
+    for name, current in results["latency_ms"].items():
+        base = baseline.get("latency_ms", {}).get(name)
+        if base is None:
+            print(f"{name:<32}{'(new)':>8}")
+            continue
+        for metric in ("p50", "p90"):
+            if base[metric] <= 0:
+                continue
+            delta = (current[metric] - base[metric]) / base[metric] * 100
+            flag = "  <-- regression" if delta > threshold else ""
+            print(f"{name:<32}{metric:>8}{base[metric]:>10.3f}{current[metric]:>10.3f}{delta:>+8.1f}%{flag}")
+            if delta > threshold and name not in regressions:
+                regressions.append(name)
+
+    base_rss = baseline.get("peak_rss_mb")
+    if base_rss and results["peak_rss_mb"]:
+        print(f"\npeak RSS: {base_rss:.1f}MB -> {results['peak_rss_mb']:.1f}MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--screen", default="2560x1440", help="Xvfb screen size (WxH)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against a JSON baseline")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="percent slowdown of p50/p90 that counts as a regression")
+    parser.add_argument("--assets", action="store_true",
+                        help="only compare overlay asset decode time and size (PNG vs .ovl)")
+    args = parser.parse_args()
+
+    if args.assets:
+        sys.path.insert(0, ROOT_DIR)
+        print(f"{'asset':<20}{'bytes':>10}{'p50':>10}{'p90':>10}  (ms)")
+        for name, stats in bench_asset_decode(args.iterations).items():
+            print(f"{name:<20}{stats['bytes']:>10}{stats['p50']:>10.3f}{stats['p90']:>10.3f}")
+        return
+
+    xvfb = None
+    if platform.system() == "Linux" and not os.environ.get("DISPLAY"):
+        width, height = (int(v) for v in args.screen.lower().split("x"))
+        xvfb = start_xvfb(width, height)
+
+    # Keep the user's config.ini and image cache out of the run
+    config_home = tempfile.mkdtemp(prefix="overlay_bench_")
+    os.environ["HOME"] = config_home
+    os.environ["LOCALAPPDATA"] = config_home
+
+    # Assets are resolved relative to the working directory
+    os.chdir(ROOT_DIR)
+    sys.path.insert(0, ROOT_DIR)
+
+    bench = None
+    try:
+        bench = Benchmark(args.iterations)
+        results = bench.run()
+    finally:
+        if bench:
+            bench.close()
+        if xvfb:
+            xvfb.terminate()
+        shutil.rmtree(config_home, ignore_errors=True)
+
+    print(f"\n{'benchmark':<32}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+    for name, stats in results["latency_ms"].items():
+        print(f"{name:<32}{stats['p50']:>10.3f}{stats['p90']:>10.3f}{stats['p99']:>10.3f}{stats['max']:>10.3f}")
+    area = results["window_area"]
+    print(f"\nwindow area: {area['idle_px']}px idle ({area['idle_share']:.1%} of screen), "
+          f"{area['capture_px']}px while capturing")
+    if results["peak_rss_mb"] is not None:
+        print(f"\npeak RSS: {results['peak_rss_mb']:.1f}MB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=4)
+                f.write("\n")
+            print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
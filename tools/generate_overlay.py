@@ -1,22 +1,213 @@
-from PIL import Image, ImageDraw
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw, ImageFilter
+from PIL.PngImagePlugin import PngInfo
 
-def create_overlay():
+# Fallback when image.png is missing or detection is not confident
+# Center: (1190, 1177), Radius: 765 from previous analysis
+DEFAULT_CIRCLE = (1192, 1175, 773.44)
+
+OVL_MAGIC = b"OVL1"
+OVL_HEADER = struct.Struct("<4sHHHHHHBBB")   # magic, source w/h, mask box, RGB
+
+VARIANTS_DIR = 'assets/variants'
+VARIANT_VERSION = 1     # bump when render_variant output changes for the same inputs
+SUPERSAMPLE = 4         # variants are drawn at 4x and box-filtered down for anti-aliasing
+
+COARSE_SIZE = 256       # longest side of the edge map RANSAC runs on
+RANSAC_ITERATIONS = 400
+MIN_CONFIDENCE = 0.6    # share of rays with a distinct edge on the fitted circle
+
+def edge_points(gray, threshold_quantile=0.97):
+    """Coordinates of the strongest edges in a grayscale image"""
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+    histogram = edges.histogram()
+    total = edges.width * edges.height
+    # Intensity above which the top (1 - quantile) of pixels lie
+    cutoff, seen = 255, 0
+    while cutoff > 1 and seen + histogram[cutoff] < total * (1 - threshold_quantile):
+        seen += histogram[cutoff]
+        cutoff -= 1
+    width = edges.width
+    return [(i % width, i // width) for i, v in enumerate(edges.tobytes()) if v >= cutoff]
+
+def circle_from_points(p1, p2, p3):
+    """Circumscribed circle of three points, None if they are collinear"""
+    (x1, y1), (x2, y2), (x3, y3) = p1, p2, p3
+    d = 2 * (x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2))
+    if abs(d) < 1e-9:
+        return None
+    s1, s2, s3 = x1 * x1 + y1 * y1, x2 * x2 + y2 * y2, x3 * x3 + y3 * y3
+    cx = (s1 * (y2 - y3) + s2 * (y3 - y1) + s3 * (y1 - y2)) / d
+    cy = (s1 * (x3 - x2) + s2 * (x1 - x3) + s3 * (x2 - x1)) / d
+    return cx, cy, math.hypot(x1 - cx, y1 - cy)
+
+def ransac_circle(points, min_r, max_r, tolerance=1.5, seed=0):
+    """Best-supported circle among random point triples (coarse search)"""
+    rng = random.Random(seed)
+    sample = points if len(points) <= 1500 else rng.sample(points, 1500)
+    best, best_inliers = None, 0
+    for _ in range(RANSAC_ITERATIONS):
+        circle = circle_from_points(*rng.sample(sample, 3))
+        if circle is None or not min_r <= circle[2] <= max_r:
+            continue
+        cx, cy, r = circle
+        inliers = sum(1 for x, y in sample if abs(math.hypot(x - cx, y - cy) - r) < tolerance)
+        if inliers > best_inliers:
+            best, best_inliers = circle, inliers
+    return best
+
+def kasa_fit(points):
+    """Algebraic least-squares circle (Kasa): x^2 + y^2 + Dx + Ey + F = 0"""
+    n = len(points)
+    mx = sum(x for x, _ in points) / n
+    my = sum(y for _, y in points) / n
+    # Centered coordinates keep the normal equations well conditioned
+    suu = suv = svv = suuu = svvv = suvv = svuu = 0.0
+    for x, y in points:
+        u, v = x - mx, y - my
+        suu += u * u
+        suv += u * v
+        svv += v * v
+        suuu += u * u * u
+        svvv += v * v * v
+        suvv += u * v * v
+        svuu += v * u * u
+    det = suu * svv - suv * suv
+    if abs(det) < 1e-9:
+        return None
+    b1 = (suuu + suvv) / 2
+    b2 = (svvv + svuu) / 2
+    uc = (b1 * svv - b2 * suv) / det
+    vc = (b2 * suu - b1 * suv) / det
+    r = math.sqrt(uc * uc + vc * vc + (suu + svv) / n)
+    return mx + uc, my + vc, r
+
+def circle_support(edges, circle, rays=360):
+    """Share of rays where the edge on the circle clearly stands out from its surroundings"""
+    cx, cy, r = circle
+    pixels = edges.load()
+    width, height = edges.size
+    supported = 0
+    for k in range(rays):
+        angle = 2 * math.pi * k / rays
+        dx, dy = math.cos(angle), math.sin(angle)
+        band, background = 0, []
+        for step in range(-10, 11):
+            x = int(round(cx + (r + step) * dx))
+            y = int(round(cy + (r + step) * dy))
+            if not (0 <= x < width and 0 <= y < height):
+                continue
+            if abs(step) <= 2:
+                band = max(band, pixels[x, y])
+            elif abs(step) >= 5:
+                background.append(pixels[x, y])
+        if background and band > 3 * sum(background) / len(background) + 16:
+            supported += 1
+    return supported / rays
+
+def refine_circle(edges, circle, window, rays=720):
+    """Centroid of edge strength along radial rays near the circle, then a Kasa fit"""
+    cx, cy, r = circle
+    pixels = edges.load()
+    width, height = edges.size
+    points = []
+    for k in range(rays):
+        angle = 2 * math.pi * k / rays
+        dx, dy = math.cos(angle), math.sin(angle)
+        total = weighted = 0.0
+        for step in range(-window, window + 1):
+            x = int(round(cx + (r + step) * dx))
+            y = int(round(cy + (r + step) * dy))
+            if 0 <= x < width and 0 <= y < height:
+                strength = pixels[x, y]
+                if strength > 32:
+                    total += strength
+                    weighted += strength * (r + step)
+        if total:
+            radius = weighted / total
+            points.append((cx + radius * dx, cy + radius * dy))
+    if len(points) < rays // 4:
+        return None
+
+    fitted = kasa_fit(points)
+    if fitted is None:
+        return None
+    fx, fy, fr = fitted
+    inliers = [p for p in points if abs(math.hypot(p[0] - fx, p[1] - fy) - fr) < 2.0]
+    if len(inliers) >= 3 and len(inliers) < len(points):
+        fitted = kasa_fit(inliers) or fitted
+    return fitted
+
+def detect_circle(img):
+    """Find the zone circle: RANSAC on a downsampled edge map, then refine at full resolution.
+
+    Returns (cx, cy, r, confidence) or None.
+    """
+    gray = img.convert('L')
+    factor = max(1, max(gray.size) // COARSE_SIZE)
+    coarse = gray.reduce(factor) if factor > 1 else gray
+    points = edge_points(coarse)
+    if len(points) < 3:
+        return None
+
+    short_side = min(coarse.size)
+    circle = ransac_circle(points, short_side * 0.1, short_side * 0.6)
+    if circle is None:
+        return None
+    cx, cy, r = (v * factor + (factor - 1) / 2 for v in circle)
+
+    # Two passes: wide window to absorb the coarse error, then a narrow one
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+    for window in (2 * factor + 4, 6):
+        refined = refine_circle(edges, (cx, cy, r), window)
+        if refined is None:
+            return None
+        cx, cy, r = refined
+    return cx, cy, r, circle_support(edges, (cx, cy, r))
+
+def default_output(map_id):
+    """Overlay PNG path for a map; Sanhok keeps its original asset name"""
+    return 'assets/overlay_circle.png' if map_id == 'sanhok' else f'assets/overlay_{map_id}.png'
+
+def create_overlay(detect=True, map_id='sanhok', output=None, source='image.png'):
+    output = output or default_output(map_id)
+    mask_path = os.path.splitext(output)[0] + '.ovl'
+    cx, cy, r = DEFAULT_CIRCLE
+    thickness = 5 # Thickness of the circle line
+    confidence = None
     try:
-        img = Image.open('image.png').convert('RGBA')
+        img = Image.open(source).convert('RGBA')
     except FileNotFoundError:
-        print("image.png not found. Creating a placeholder circle.")
+        print(f"{source} not found. Creating a placeholder circle.")
         width, height = 2475, 2475
     else:
         width, height = img.size
-    
+        if detect:
+            started = time.perf_counter()
+            result = detect_circle(img)
+            elapsed = (time.perf_counter() - started) * 1000
+            if result is not None and result[3] >= MIN_CONFIDENCE:
+                cx, cy, r, confidence = (round(v, 2) for v in result)
+                # ImageDraw strokes inwards from the bounding box: center the stroke on the detected line
+                r = round(r + thickness / 2, 2)
+                print(f"Detected circle: center ({cx}, {cy}), r {r}, confidence {confidence:.2f} ({elapsed:.0f}ms)")
+            else:
+                score = f"{result[3]:.2f}" if result else "n/a"
+                print(f"Circle detection failed (confidence {score}), using default {DEFAULT_CIRCLE}.")
+
     # Create a new transparent image
     overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
 
-    # Center and Radius from previous analysis
-    # Center: (1190, 1177), Radius: 765
-    cx, cy = 1192, 1175
-    r = 773.44
-    thickness = 5 # Thickness of the circle line
     color = (255, 50, 80, 255) # Stylish Neon Red
 
     draw = ImageDraw.Draw(overlay)
@@ -27,8 +218,215 @@ def create_overlay():
     
     draw.ellipse([left_up, right_down], outline=color, width=thickness)
 
-    overlay.save('assets/overlay_circle.png')
-    print("assets/overlay_circle.png created.")
+    metadata = PngInfo()
+    metadata.add_text("circle", json.dumps({"cx": cx, "cy": cy, "r": r, "confidence": confidence}))
+    overlay.save(output, pnginfo=metadata)
+    print(f"{output} created.")
+    write_ovl(overlay, mask_path)
+
+    # Geometry used by the overlay's vector render mode
+    update_manifest(map_id, {
+        "image": output.replace(os.sep, '/'),
+        "mask": mask_path.replace(os.sep, '/'),
+        "width": width,
+        "height": height,
+        "circle": {
+            "cx": cx,
+            "cy": cy,
+            "r": r,
+            "thickness": thickness,
+            "color": "#{:02X}{:02X}{:02X}".format(*color[:3])
+        }
+    })
+
+def update_manifest(map_id, fields, manifest_path='assets/maps.json'):
+    """Merge fields into the map's entry in the map manifest, keeping other maps intact"""
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {"default": map_id, "maps": []}
+
+    entry = next((m for m in manifest["maps"] if m["id"] == map_id), None)
+    if entry is None:
+        entry = {"id": map_id}
+        manifest["maps"].append(entry)
+    entry.update(fields)
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+        f.write("\n")
+    print(f"{manifest_path} updated ({map_id}).")
+
+def encode_ovl(image):
+    """Compact form of a single-color overlay with binary alpha (read by main.decode_ovl).
+
+    Only the alpha bounding box is stored, as a zlib-compressed 1-bit mask.
+    Raises ValueError if the image has more than one visible color or partial alpha.
+    """
+    image = image.convert('RGBA')
+    alpha = image.getchannel('A')
+    if any(v not in (0, 255) for _, v in alpha.getcolors(256)):
+        raise ValueError("alpha is not binary")
+    box = alpha.getbbox() or (0, 0, 1, 1)
+    colors = image.crop(box).getcolors(2 ** 16) or []
+    visible = {c[:3] for _, c in colors if c[3]}
+    if len(visible) > 1:
+        raise ValueError(f"{len(visible)} visible colors, expected one")
+    r, g, b = visible.pop() if visible else (0, 0, 0)
+    mask = alpha.crop(box).point(lambda v: 255 if v else 0).convert('1')
+    header = OVL_HEADER.pack(OVL_MAGIC, image.width, image.height, *box, r, g, b)
+    return header + zlib.compress(mask.tobytes(), 9)
+
+def write_ovl(image, path):
+    with open(path, 'wb') as f:
+        f.write(encode_ovl(image))
+    print(f"{path} created.")
+
+def variant_inputs(entry, target_height, scale):
+    """Everything a variant's pixels depend on; its hash decides whether to re-render"""
+    return {
+        "map": entry["id"],
+        "width": entry.get("width", 2475),
+        "height": entry.get("height", 2475),
+        "circle": entry["circle"],
+        "target_height": target_height,
+        "scale": scale,
+        "version": VARIANT_VERSION,
+        "supersample": SUPERSAMPLE,
+    }
+
+def hash_inputs(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def render_variant(inputs, path):
+    """Draw the circle directly at its on-screen size, cropped to the circle (worker process).
+
+    Uses the same geometry as main.py's vector mode, so the variant is placed
+    centered on (cx - width / 2, cy - height / 2) * final_scale from the overlay center.
+    """
+    circle = inputs["circle"]
+    final_scale = inputs["target_height"] / inputs["height"] * inputs["scale"]
+    thickness = circle.get("thickness", 5)
+    r = circle["r"] * final_scale
+    stroke = max(1, round(thickness * final_scale))
+
+    # Even size with a 1px margin keeps the circle centered and the stroke unclipped
+    size = 2 * math.ceil(r) + 2
+    big = Image.new('RGBA', (size * SUPERSAMPLE, size * SUPERSAMPLE), (0, 0, 0, 0))
+    center = size * SUPERSAMPLE / 2
+    big_r = r * SUPERSAMPLE
+    color = circle.get("color", "#FF3250")
+    ImageDraw.Draw(big).ellipse(
+        [center - big_r, center - big_r, center + big_r, center + big_r],
+        outline=color, width=stroke * SUPERSAMPLE
+    )
+    image = big.reduce(SUPERSAMPLE)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    data = buffer.getvalue()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return {
+        "file": os.path.basename(path),
+        "size": list(image.size),
+        "center": [circle["cx"] - inputs["width"] / 2, circle["cy"] - inputs["height"] / 2],
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+def file_sha256(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def generate_variants(map_ids, heights, scales, jobs=None, manifest_path='assets/maps.json',
+                      out_dir=VARIANTS_DIR):
+    """Render every map x height x scale variant in parallel, skipping unchanged ones"""
+    with open(manifest_path, encoding='utf-8') as f:
+        maps = {m["id"]: m for m in json.load(f)["maps"]}
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, 'manifest.json')
+    try:
+        with open(index_path, encoding='utf-8') as f:
+            previous = {v["input_hash"]: v for v in json.load(f)["variants"]}
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        previous = {}
+
+    variants, jobs_to_run = [], []
+    for map_id in map_ids or list(maps):
+        entry = maps.get(map_id)
+        if entry is None or "circle" not in entry:
+            print(f"Skipping {map_id}: no circle geometry in {manifest_path}.")
+            continue
+        for height in heights:
+            for scale in scales:
+                inputs = variant_inputs(entry, height, scale)
+                input_hash = hash_inputs(inputs)
+                path = os.path.join(out_dir, f"{map_id}_{height}_{scale:g}.png")
+                known = previous.get(input_hash)
+                # Unchanged inputs and an untouched output file: nothing to do
+                if known and file_sha256(path) == known["sha256"]:
+                    variants.append(known)
+                    continue
+                jobs_to_run.append((inputs, input_hash, path))
+
+    started = time.perf_counter()
+    if jobs_to_run:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [(pool.submit(render_variant, inputs, path), inputs, input_hash)
+                       for inputs, input_hash, path in jobs_to_run]
+            for future, inputs, input_hash in futures:
+                result = future.result()
+                result.update(map=inputs["map"], height=inputs["target_height"],
+                              scale=inputs["scale"], circle=inputs["circle"], input_hash=input_hash)
+                variants.append(result)
+    elapsed = time.perf_counter() - started
+
+    # Keep earlier variants this run did not cover, as long as their files are intact
+    covered = {(v["map"], v["height"], v["scale"]) for v in variants}
+    for known in previous.values():
+        key = (known["map"], known["height"], known["scale"])
+        if key not in covered and file_sha256(os.path.join(out_dir, known["file"])) == known["sha256"]:
+            variants.append(known)
+            covered.add(key)
+
+    variants.sort(key=lambda v: (v["map"], v["height"], v["scale"]))
+    with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({"variants": variants}, f, indent=4, ensure_ascii=False)
+        f.write("\n")
+    os.replace(index_path + '.tmp', index_path)
+    print(f"{len(jobs_to_run)} variants rendered, {len(variants) - len(jobs_to_run)} kept "
+          f"({elapsed:.2f}s). Index written to {index_path}.")
+
+def parse_list(value, kind):
+    return [kind(v) for v in value.split(',') if v.strip()]
 
 if __name__ == "__main__":
-    create_overlay()
+    parser = argparse.ArgumentParser(description="Generate the zone circle overlay from image.png")
+    parser.add_argument("--no-detect", action="store_true",
+                        help="skip circle detection and use the built-in circle")
+    parser.add_argument("--map", default="sanhok",
+                        help="map id whose assets and maps.json entry are written (default: sanhok)")
+    parser.add_argument("--output", default=None,
+                        help="overlay PNG path, the .ovl mask is written next to it "
+                             "(default: assets/overlay_circle.png for sanhok, else assets/overlay_<map>.png)")
+    parser.add_argument("--input", default="image.png", help="map screenshot to detect the circle in")
+    parser.add_argument("--batch", action="store_true",
+                        help=f"render pre-scaled variants into {VARIANTS_DIR} instead")
+    parser.add_argument("--maps", type=lambda v: parse_list(v, str), default=None,
+                        help="comma separated map ids (default: every map in maps.json)")
+    parser.add_argument("--heights", type=lambda v: parse_list(v, int), default=[1080, 1440, 2160],
+                        help="comma separated target heights (default: 1080,1440,2160)")
+    parser.add_argument("--scales", type=lambda v: parse_list(v, float), default=[1.0],
+                        help="comma separated scale factors (default: 1.0)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+    if args.batch:
+        generate_variants(args.maps, args.heights, args.scales, args.jobs)
+    else:
+        create_overlay(detect=not args.no_detect, map_id=args.map, output=args.output, source=args.input)